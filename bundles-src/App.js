@@ -13,6 +13,15 @@ import NoResults from "./components/NoResults";
 
 import './css/App.css';
 
+const PRODUCTS_PAGE_SIZE = 24;
+
+function generateCheckoutKey(){
+  if (window.crypto && window.crypto.randomUUID){
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+}
+
 class App extends Component {
 
   constructor(props){
@@ -25,6 +34,7 @@ class App extends Component {
       quickViewProduct: null,  // will be replaced by selected product attributes
       showCart: false,
       checkoutModalActive: false,
+      checkoutKey: null,  // Idempotency-Key of the current checkout, reused when the request is retried
     };
     this.handleSearch = this.handleSearch.bind(this);
     this.handleAddToCart = this.handleAddToCart.bind(this);
@@ -62,6 +72,9 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    let checkoutKey = this.state.checkoutKey || generateCheckoutKey();
+    this.setState({checkoutKey});
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,11 +82,14 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': checkoutKey,
         },
         body: JSON.stringify(data),
       });
 
       if (!response.ok){
+        // the server remembers the failed response for this key, so a corrected order needs a new one
+        this.setState({checkoutKey: null});
         alert('Ошибка при оформлении заказа. Попробуйте ещё раз или свяжитесь с нами по телефону.');
         return;
       }
@@ -81,6 +97,7 @@ class App extends Component {
 
       this.setState({
         cart: [],
+        checkoutKey: null,
       });
 
       alert("Заказ оформлен. Вам перезвонят в течение 10 минут.");
@@ -101,8 +118,8 @@ class App extends Component {
   }
 
 
-  async getProducts(){
-    let response = await fetch('/api/products/', {
+  async fetchProductsPage(url){
+    let response = await fetch(url, {
       headers: {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
@@ -110,12 +127,31 @@ class App extends Component {
     });
 
     if (!response.ok){
+      return null;
+    }
+    return await response.json();
+  }
+
+  async getProducts(){
+    // the first screen is rendered as soon as the first page arrives,
+    // the whole menu then comes from the unfiltered /api/products/, which the browser and the server cache by ETag
+    let page = await this.fetchProductsPage(`/api/products/?limit=${PRODUCTS_PAGE_SIZE}`);
+    if (!page){
       return;
     }
+    this.setState({
+      products : page.results
+    });
 
-    let data = await response.json();
+    if (!page.next){
+      return;
+    }
+    const products = await this.fetchProductsPage('/api/products/');
+    if (!products){
+      return;
+    }
     this.setState({
-      products : data
+      products : products
     });
   }
 
@@ -39,13 +39,25 @@ class Product extends Component{
 
   render(){
     let image = this.props.product.image;
+    let imageVariants = this.props.product.image_variants || [];
+    let webpSrcSet = imageVariants
+      .filter(variant => variant.type === 'image/webp')
+      .map(variant => `${variant.url} ${variant.width}w`)
+      .join(', ');
+    let srcSet = imageVariants
+      .filter(variant => variant.type !== 'image/webp')
+      .map(variant => `${variant.url} ${variant.width}w`)
+      .join(', ');
     let name = this.props.product.name;
     let price = this.props.product.price;
     let id = this.props.product.id;
     return (
       <div className="product">
         <div className="product-image">
-          <img src={image} alt={name} onClick={this.quickView.bind(this)}/>
+          <picture>
+            {webpSrcSet && <source type="image/webp" srcSet={webpSrcSet} sizes="300px"/>}
+            <img src={image} srcSet={srcSet || undefined} sizes="300px" alt={name} onClick={this.quickView.bind(this)}/>
+          </picture>
         </div>
         <h4 className="product-name">{name}</h4>
         <p className="product-price currency">{price}</p>
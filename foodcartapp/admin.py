@@ -7,12 +7,18 @@ from django.utils.http import url_has_allowed_host_and_scheme
 from django.shortcuts import redirect
 
 
+from .models import Banner
 from .models import Product
 from .models import ProductCategory
 from .models import Restaurant
 from .models import RestaurantMenuItem
 from .models import Order
 from .models import OrderItem
+from .candidates import update_order_candidates
+from .search import search_products
+
+
+ADMIN_SEARCH_LIMIT = 1000
 
 
 class RestaurantMenuItemInline(admin.TabularInline):
@@ -34,6 +40,7 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'capacity',
     ]
     inlines = [
         RestaurantMenuItemInline
@@ -55,8 +62,6 @@ class ProductAdmin(admin.ModelAdmin):
         'category',
     ]
     search_fields = [
-        # FIXME SQLite can not convert letter case for cyrillic words properly, so search will be buggy.
-        # Migration to PostgreSQL is necessary
         'name',
         'category__name',
     ]
@@ -99,14 +104,20 @@ class ProductAdmin(admin.ModelAdmin):
     def get_image_preview(self, obj):
         if not obj.image:
             return 'выберите картинку'
-        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.image.url)
+        return format_html('<img src="{url}" style="max-height: 200px;"/>', url=obj.get_thumbnail_url(300))
     get_image_preview.short_description = 'превью'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        product_ids = search_products(search_term, limit=ADMIN_SEARCH_LIMIT, available_only=False)
+        return queryset.filter(pk__in=product_ids), False
+
     def get_image_list_preview(self, obj):
         if not obj.image or not obj.id:
             return 'нет картинки'
         edit_url = reverse('admin:foodcartapp_product_change', args=(obj.id,))
-        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.image.url)
+        return format_html('<a href="{edit_url}"><img src="{src}" style="max-height: 50px;"/></a>', edit_url=edit_url, src=obj.thumbnail_url)
     get_image_list_preview.short_description = 'превью'
 
 
@@ -115,6 +126,19 @@ class ProductAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(Banner)
+class BannerAdmin(admin.ModelAdmin):
+    list_display = [
+        'title',
+        'position',
+        'active_from',
+        'active_until',
+    ]
+    list_editable = [
+        'position',
+    ]
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     inlines = [
@@ -129,6 +153,7 @@ class OrderAdmin(admin.ModelAdmin):
                 instance.price = instance.product.price
             instance.save()
         formset.save_m2m()
+        update_order_candidates([form.instance])
 
     def response_change(self, request, obj):
 
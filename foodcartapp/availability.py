@@ -0,0 +1,68 @@
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Restaurant, RestaurantMenuItem
+
+
+def get_positions(ids, values):
+    # Номера values в списке ids, который упорядочен как угодно, без цикла по Python-объектам
+    sorter = np.argsort(ids)
+    return sorter[np.searchsorted(ids, values, sorter=sorter)]
+
+
+def build_availability_matrix(product_ids, restaurant_ids):
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+    matrix = np.zeros((len(product_ids), len(restaurant_ids)), dtype=bool)
+    if not matrix.size:
+        return matrix
+
+    menu_items = np.array(
+        RestaurantMenuItem.objects
+        .filter(availability=True, product_id__in=product_ids.tolist(), restaurant_id__in=restaurant_ids.tolist())
+        .values_list('product_id', 'restaurant_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    matrix[get_positions(product_ids, menu_items[:, 0]), get_positions(restaurant_ids, menu_items[:, 1])] = True
+    return matrix
+
+
+@transaction.atomic
+def set_menu_availability(cells, availability):
+    # cells — пары (id ресторана, id товара). Существующие пункты меню меняем одним UPDATE,
+    # а недостающие создаём одним bulk_create. Оба метода сами сообщают об изменении меню
+    cells = set(cells)
+    if not cells:
+        return 0
+
+    restaurant_products = {}
+    for restaurant_id, product_id in cells:
+        restaurant_products.setdefault(restaurant_id, set()).add(product_id)
+    # Параллельные переключения одних и тех же ресторанов выполняем по очереди: тогда список существующих
+    # пунктов меню не устареет до вставки, и каждый недостающий пункт действительно создаём мы
+    list(Restaurant.objects.select_for_update().filter(pk__in=restaurant_products).order_by('pk').values_list('pk'))
+    menu_items = RestaurantMenuItem.objects.filter(reduce(or_, (
+        Q(restaurant_id=restaurant_id, product_id__in=product_ids)
+        for restaurant_id, product_ids in restaurant_products.items()
+    )))
+
+    existing_cells = set(menu_items.values_list('restaurant_id', 'product_id'))
+    changed_count = menu_items.exclude(availability=availability).update(availability=availability)
+
+    # Отсутствие пункта меню и так означает «нет в продаже», поэтому создаём только включённые
+    missing_cells = cells - existing_cells
+    if availability and missing_cells:
+        RestaurantMenuItem.objects.bulk_create(
+            [
+                RestaurantMenuItem(restaurant_id=restaurant_id, product_id=product_id, availability=True)
+                for restaurant_id, product_id in missing_cells
+            ],
+            # Страховка от пункта, который в ту же секунду добавили в админке мимо блокировки
+            ignore_conflicts=True,
+        )
+        changed_count += len(missing_cells)
+    return changed_count
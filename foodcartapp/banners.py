@@ -0,0 +1,56 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Banner
+from .versions import bump_version, get_version
+
+
+BANNERS_VERSION_KEY = 'banners:version'
+
+
+def get_next_change(banners, now):
+    upcoming_dates = [
+        date
+        for banner in banners
+        for date in (banner.active_from, banner.active_until)
+        if date and date > now
+    ]
+    return min(upcoming_dates, default=None)
+
+
+def build_banners():
+    now = timezone.now()
+    banners = list(Banner.objects.all())
+    content = json.dumps([
+        {
+            'title': banner.title,
+            'src': banner.image.url,
+            'text': banner.text,
+        }
+        for banner in banners
+        if banner.is_active(now)
+    ], ensure_ascii=False, separators=(',', ':')).encode()
+    return {
+        'content': content,
+        'etag': f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        'expires_at': get_next_change(banners, now),
+    }
+
+
+def get_banners():
+    # Версия лежит в базе, поэтому сохранение баннера сбрасывает кэш во всех процессах, а не только в текущем
+    cache_key = f'banners:{get_version(BANNERS_VERSION_KEY)}'
+    banners = cache.get(cache_key)
+    # Набор активных баннеров меняется не только при сохранении, но и когда начинается или заканчивается показ
+    if banners is None or (banners['expires_at'] and banners['expires_at'] <= timezone.now()):
+        banners = build_banners()
+        cache.set(cache_key, banners, timeout=settings.BANNERS_CACHE_TIMEOUT)
+    return banners
+
+
+def invalidate_banners():
+    bump_version(BANNERS_VERSION_KEY)
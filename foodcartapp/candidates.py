@@ -0,0 +1,92 @@
+import logging
+
+from django.db import transaction
+
+from place.cache import geocode_cache, place_distance_cache
+
+from .matching import match_orders_with_restaurants
+from .models import Order, OrderCandidate, Restaurant, RestaurantMenuItem
+from .restaurant_places import invalidate_restaurant_places, restaurant_places_index
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_order_candidates(orders):
+    order_restaurants = match_orders_with_restaurants(orders)
+    order_points = geocode_cache.get_points(order.address for order in orders)
+    missing_addresses = {order.address for order in orders} - order_points.keys()
+    if missing_addresses:
+        logger.info('Нет координат для адресов: %s', ', '.join(sorted(missing_addresses)))
+
+    restaurant_places = restaurant_places_index.get_state() if order_points else None
+    order_candidates = []
+    coordinates = {}
+    for order in orders:
+        capable_restaurants = order_restaurants[order.id]
+        if not capable_restaurants:
+            continue
+        if order.address not in order_points:
+            # Пока адрес не геокодирован, показываем все подходящие рестораны без расстояния
+            order_candidates.extend((order, restaurant_id, None) for restaurant_id in capable_restaurants)
+            continue
+
+        customer_place_id, customer_coordinates = order_points[order.address]
+        coordinates[customer_place_id] = customer_coordinates
+        nearest_restaurants = restaurant_places.find_nearest(customer_coordinates, capable_restaurants)
+        for restaurant_id, restaurant_place_id, restaurant_coordinates in nearest_restaurants:
+            coordinates[restaurant_place_id] = restaurant_coordinates
+            order_candidates.append((order, restaurant_id, (restaurant_place_id, customer_place_id)))
+
+    distances = place_distance_cache.get_distances(
+        {pair for _, _, pair in order_candidates if pair},
+        coordinates,
+    )
+    return [
+        OrderCandidate(order=order, restaurant_id=restaurant_id, distance=distances.get(pair))
+        for order, restaurant_id, pair in order_candidates
+    ]
+
+
+def update_order_candidates(orders):
+    orders = list(orders)
+    if not orders:
+        return []
+
+    candidates = build_order_candidates(orders)
+    with transaction.atomic():
+        OrderCandidate.objects.filter(order__in=orders).delete()
+        OrderCandidate.objects.bulk_create(candidates)
+    return candidates
+
+
+def update_candidates_for_products(product_ids):
+    orders = Order.objects.open().filter(order_items__product_id__in=product_ids).distinct()
+    return update_order_candidates(orders.only('address'))
+
+
+def get_restaurant_orders(restaurant_ids):
+    # Ресторан мог не попасть в варианты, потому что был без координат или далеко.
+    # Поэтому берём все открытые заказы, в которых есть товары из его меню
+    product_ids = (
+        RestaurantMenuItem.objects
+        .filter(restaurant_id__in=restaurant_ids, availability=True)
+        .values('product_id')
+    )
+    return Order.objects.open().filter(order_items__product_id__in=product_ids).distinct().only('address')
+
+
+def update_candidates_for_restaurants(restaurant_ids):
+    invalidate_restaurant_places()
+    return update_order_candidates(get_restaurant_orders(restaurant_ids))
+
+
+def update_candidates_for_places(address_keys):
+    address_keys = set(address_keys)
+    orders = list(Order.objects.open().filter(address_key__in=address_keys).only('address'))
+    restaurant_ids = list(Restaurant.objects.filter(address_key__in=address_keys).values_list('id', flat=True))
+    if restaurant_ids:
+        invalidate_restaurant_places()
+        order_ids = {order.id for order in orders}
+        orders.extend(get_restaurant_orders(restaurant_ids).exclude(id__in=order_ids))
+    return update_order_candidates(orders)
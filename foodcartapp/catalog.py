@@ -0,0 +1,228 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Product
+from .versions import bump_version, get_version
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: там сайт запускают только для разработки, в одном процессе, и блокировка не нужна
+    fcntl = None
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_MODIFIED_AT_KEY = 'catalog:modified_at'
+
+SNAPSHOT_META_FILENAME = 'catalog.meta.json'
+SNAPSHOT_LOCK_FILENAME = 'catalog.lock'
+SNAPSHOT_ENCODINGS = {
+    'br': '.br',
+    'gzip': '.gz',
+    'identity': '',
+}
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    cache.set(CATALOG_MODIFIED_AT_KEY, timezone.now(), timeout=None)
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': product.price,
+        'special_status': product.special_status,
+        'description': product.description,
+        'category': {
+            'id': product.category.id,
+            'name': product.category.name,
+        } if product.category else None,
+        'image': product.image.url,
+        'image_variants': product.get_image_variants(),
+        'restaurant': {
+            'id': product.id,
+            'name': product.name,
+        }
+    }
+
+
+def serialize_catalog():
+    products = Product.objects.select_related('category').available()
+    return [serialize_product(product) for product in products]
+
+
+def build_catalog():
+    content = json.dumps(
+        serialize_catalog(),
+        cls=DjangoJSONEncoder,
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode()
+    return {
+        'content': content,
+        'etag': f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+        'last_modified': cache.get(CATALOG_MODIFIED_AT_KEY) or timezone.now(),
+    }
+
+
+def get_catalog():
+    cache_key = f'catalog:{get_catalog_version()}'
+    catalog = cache.get(cache_key)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(cache_key, catalog, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
+
+
+def write_file_atomic(path, content):
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as file:
+        file.write(content)
+    os.chmod(file.name, 0o644)
+    os.replace(file.name, path)
+
+
+def compress_catalog(content):
+    compressed = {
+        'identity': content,
+        'gzip': gzip.compress(content, compresslevel=9, mtime=0),
+    }
+    if brotli:
+        compressed['br'] = brotli.compress(content, quality=11)
+    return compressed
+
+
+@contextmanager
+def lock_snapshot_dir(snapshot_dir):
+    # Снимок пишут несколько процессов. Без блокировки один мог бы удалить файлы,
+    # на которые только что сослались метаданные другого. Каталог собираем уже под блокировкой,
+    # поэтому последним всегда пишет тот, кто прочитал самые свежие данные
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(snapshot_dir, SNAPSHOT_LOCK_FILENAME), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_catalog_snapshot(snapshot_dir=None):
+    snapshot_dir = snapshot_dir or settings.CATALOG_SNAPSHOT_DIR
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    with lock_snapshot_dir(snapshot_dir):
+        return _write_catalog_snapshot(snapshot_dir)
+
+
+def _write_catalog_snapshot(snapshot_dir):
+    catalog = build_catalog()
+    content_hash = catalog['etag'].strip('"')
+    filenames = {}
+    for encoding, content in compress_catalog(catalog['content']).items():
+        filename = f'catalog-{content_hash}.json{SNAPSHOT_ENCODINGS[encoding]}'
+        write_file_atomic(os.path.join(snapshot_dir, filename), content)
+        filenames[encoding] = filename
+
+    # Файлы с данными пишем до метаданных, поэтому читатель никогда не увидит ссылку на недописанный файл
+    meta = {
+        'etag': catalog['etag'],
+        'last_modified': catalog['last_modified'].timestamp(),
+        'files': filenames,
+    }
+    write_file_atomic(os.path.join(snapshot_dir, SNAPSHOT_META_FILENAME), json.dumps(meta).encode())
+
+    current_filenames = set(filenames.values())
+    for filename in os.listdir(snapshot_dir):
+        if filename.startswith('catalog-') and filename not in current_filenames:
+            os.remove(os.path.join(snapshot_dir, filename))
+    return meta
+
+
+class CatalogSnapshot:
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        self.meta_mtime = None
+        self.etag = None
+        self.last_modified = None
+        self.variants = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        meta_path = os.path.join(self.snapshot_dir, SNAPSHOT_META_FILENAME)
+        try:
+            meta_mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if meta_mtime == self.meta_mtime:
+            return True
+
+        with self._lock:
+            if meta_mtime == self.meta_mtime:
+                return True
+            try:
+                with open(meta_path, 'rb') as file:
+                    meta = json.load(file)
+                variants = {}
+                for encoding, filename in meta['files'].items():
+                    with open(os.path.join(self.snapshot_dir, filename), 'rb') as file:
+                        variants[encoding] = file.read()
+            except FileNotFoundError:
+                # Снимок как раз пересобирается: до следующего запроса отдаём то, что уже загружено
+                return bool(self.variants)
+            self.etag = meta['etag']
+            self.last_modified = int(meta['last_modified'])
+            self.variants = variants
+            self.meta_mtime = meta_mtime
+        return True
+
+    def get_variant(self, accept_encoding):
+        accepted_encodings = {
+            encoding.split(';')[0].strip().lower()
+            for encoding in accept_encoding.split(',')
+            if not encoding.replace(' ', '').endswith(';q=0')
+        }
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted_encodings and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, self.variants['identity']
+
+
+catalog_snapshot = CatalogSnapshot(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def refresh_catalog():
+    bump_catalog_version()
+    write_catalog_snapshot()
+
+
+def schedule_catalog_refresh():
+    # Снимок пересобираем один раз после коммита, сколько бы товаров и пунктов меню ни поменяла транзакция.
+    # Если транзакцию откатят, Django выбросит и отложенный вызов, и следующий вызов запланирует его заново
+    connection = transaction.get_connection()
+    if any(func is refresh_catalog for _, func, *_ in connection.run_on_commit):
+        return
+    transaction.on_commit(refresh_catalog)
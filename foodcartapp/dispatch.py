@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+from django.db import transaction
+
+from .models import Order, OrderCandidate, Restaurant
+
+
+Assignment = namedtuple('Assignment', ['order_id', 'restaurant_id', 'distance', 'score'])
+
+
+def get_remaining_capacity():
+    loads = Order.objects.get_restaurant_loads()
+    return {
+        restaurant_id: None if capacity is None else max(capacity - loads.get(restaurant_id, 0), 0)
+        for restaurant_id, capacity in Restaurant.objects.values_list('id', 'capacity')
+    }
+
+
+def assign_orders(candidates, remaining_capacity):
+    # candidates — четвёрки (id заказа, id ресторана, расстояние, оценка). Жадно перебираем пары от лучшей
+    # оценки к худшей: заказ достаётся ресторану, если у того ещё есть место. Ёмкость None — без ограничений
+    remaining_capacity = dict(remaining_capacity)
+    assignments = {}
+    for order_id, restaurant_id, distance, score in sorted(candidates, key=lambda candidate: candidate[3]):
+        if order_id in assignments:
+            continue
+        capacity = remaining_capacity.get(restaurant_id, 0)
+        if capacity is not None:
+            if capacity <= 0:
+                continue
+            remaining_capacity[restaurant_id] = capacity - 1
+        assignments[order_id] = Assignment(order_id, restaurant_id, distance, score)
+    return list(assignments.values())
+
+
+@transaction.atomic
+def dispatch_orders(dry_run=False):
+    orders = Order.objects.awaiting_dispatch().select_for_update().in_bulk()
+    candidates = (
+        OrderCandidate.objects
+        .filter(order__in=orders.keys(), distance__isnull=False)
+        .with_score()
+        .values_list('order_id', 'restaurant_id', 'distance', 'score')
+    )
+    assignments = assign_orders(candidates, get_remaining_capacity())
+
+    if not dry_run:
+        for assignment in assignments:
+            orders[assignment.order_id].restaurant_id = assignment.restaurant_id
+        Order.objects.bulk_update(
+            [orders[assignment.order_id] for assignment in assignments],
+            ['restaurant'],
+        )
+
+    assigned_order_ids = {assignment.order_id for assignment in assignments}
+    unassigned_order_ids = sorted(orders.keys() - assigned_order_ids)
+    return assignments, unassigned_order_ids
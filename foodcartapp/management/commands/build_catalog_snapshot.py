@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalog import write_catalog_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Собирает сжатые JSON-файлы каталога, которые отдаёт /api/products/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot-dir', default=settings.CATALOG_SNAPSHOT_DIR)
+
+    def handle(self, *args, **options):
+        meta = write_catalog_snapshot(options['snapshot_dir'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Каталог {meta["etag"]} записан в {options["snapshot_dir"]}: {", ".join(meta["files"].values())}'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.dispatch import dispatch_orders
+
+
+class Command(BaseCommand):
+    help = 'Распределяет необработанные заказы по ближайшим ресторанам с учётом их вместимости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Показать распределение, но не сохранять его')
+
+    def handle(self, *args, **options):
+        assignments, unassigned_order_ids = dispatch_orders(dry_run=options['dry_run'])
+        for assignment in assignments:
+            self.stdout.write(
+                f'Заказ {assignment.order_id} → ресторан {assignment.restaurant_id}, '
+                f'{assignment.distance:.2f} км, оценка {assignment.score:.2f}'
+            )
+        if unassigned_order_ids:
+            self.stdout.write(self.style.WARNING(
+                f'Не распределены заказы: {", ".join(map(str, unassigned_order_ids))}'
+            ))
+
+        total_distance = sum(assignment.distance for assignment in assignments)
+        self.stdout.write(self.style.SUCCESS(
+            f'Распределено заказов: {len(assignments)}, суммарное расстояние {total_distance:.2f} км'
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.catalog import refresh_catalog
+from foodcartapp.models import Product
+from foodcartapp.thumbnails import update_product_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Нарезает уменьшенные копии и WebP-версии картинок товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже нарезанные картинки')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').order_by('id')
+        updated_count = 0
+        for product in products.iterator():
+            if product.has_image_variants() and not options['force']:
+                continue
+            if update_product_image_variants(product):
+                updated_count += 1
+                self.stdout.write(f'{product}: {len(product.image_variants["variants"])} копий')
+            else:
+                self.stderr.write(f'{product}: не удалось обработать {product.image.name}')
+
+        if updated_count:
+            refresh_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Обработано товаров: {updated_count}'))
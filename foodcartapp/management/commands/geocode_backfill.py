@@ -0,0 +1,122 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from foodcartapp.models import Order, Restaurant
+from place.addresses import normalize_address
+from place.geocoder import GeocoderError, GeocoderUnavailable, get_geocoder, notify_places_geocoded
+from place.models import Place
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_call = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует все адреса заказов и ресторанов, для которых ещё нет координат'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Число параллельных запросов к геокодеру')
+        parser.add_argument('--rate', type=float, default=5, help='Не больше стольких запросов в секунду')
+        parser.add_argument('--chunk-size', type=int, default=100, help='Сохранять результаты пачками такого размера')
+        parser.add_argument('--retry-failed', action='store_true', help='Повторить адреса с ошибкой геокодера')
+
+    def handle(self, *args, **options):
+        addresses = {}
+        order_addresses = Order.objects.values_list('address', flat=True).distinct()
+        restaurant_addresses = Restaurant.objects.exclude(address='').values_list('address', flat=True)
+        for address in [*order_addresses, *restaurant_addresses]:
+            addresses.setdefault(normalize_address(address), address)
+
+        places = Place.objects.filter(address_key__in=addresses.keys()).in_bulk(field_name='address_key')
+        unresolved_statuses = {Place.PENDING, Place.FAILED} if options['retry_failed'] else {Place.PENDING}
+        unresolved_addresses = [
+            address for address_key, address in addresses.items()
+            if address_key not in places or places[address_key].status in unresolved_statuses
+        ]
+        total = len(unresolved_addresses)
+        self.stdout.write(f'Адресов без координат: {total}')
+        if not total:
+            return
+
+        geocoder = get_geocoder()
+        rate_limiter = RateLimiter(options['rate'])
+        results = []
+        done = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            futures = [
+                executor.submit(self.geocode, geocoder, rate_limiter, address)
+                for address in unresolved_addresses
+            ]
+            try:
+                for future in as_completed(futures):
+                    results.append(future.result())
+                    done += 1
+                    if len(results) >= options['chunk_size']:
+                        self.save_results(results, places)
+                        results = []
+                        self.stdout.write(f'Обработано {done} из {total}')
+            except KeyboardInterrupt:
+                for future in futures:
+                    future.cancel()
+                self.stderr.write('Прервано, сохраняем полученные координаты')
+            finally:
+                self.save_results(results, places)
+        self.stdout.write(self.style.SUCCESS(f'Обработано {done} из {total}'))
+
+    def geocode(self, geocoder, rate_limiter, address):
+        rate_limiter.wait()
+        try:
+            return address, geocoder.fetch_coordinates(address), None
+        except GeocoderError as error:
+            return address, None, error
+
+    def save_results(self, results, places):
+        new_places = []
+        updated_places = []
+        geocoded_keys = set()
+        today = timezone.localdate()
+        for address, coordinates, error in results:
+            address_key = normalize_address(address)
+            place = places.get(address_key) or Place(address=address, address_key=address_key)
+            if error:
+                self.stderr.write(str(error))
+                place.status = Place.PENDING
+                # Пока геокодер недоступен, попытки не расходуем: адрес подождёт следующего запуска
+                if not isinstance(error, GeocoderUnavailable):
+                    place.attempts += 1
+            elif coordinates:
+                place.lon, place.lat = coordinates
+                place.status = Place.RESOLVED
+                place.geocode_date = today
+                geocoded_keys.add(address_key)
+            else:
+                place.status = Place.NOT_FOUND
+                place.geocode_date = today
+
+            if place.pk:
+                updated_places.append(place)
+            else:
+                new_places.append(place)
+                places[address_key] = place
+
+        with transaction.atomic():
+            Place.objects.bulk_create(new_places, ignore_conflicts=True)
+            Place.objects.bulk_update(updated_places, ['lat', 'lon', 'status', 'attempts', 'geocode_date'])
+            if geocoded_keys:
+                notify_places_geocoded(geocoded_keys)
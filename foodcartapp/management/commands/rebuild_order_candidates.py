@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import update_order_candidates
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Заново подбирает рестораны для всех открытых заказов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.open().only('address').order_by('id')
+        chunk_size = options['chunk_size']
+        orders_count = 0
+        candidates_count = 0
+        last_id = 0
+        while True:
+            chunk = list(orders.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            candidates_count += len(update_order_candidates(chunk))
+            orders_count += len(chunk)
+            last_id = chunk[-1].id
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Заказов: {orders_count}, вариантов ресторанов: {candidates_count}'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodcartapp.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковый индекс товаров'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            products_count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано товаров: {products_count}'))
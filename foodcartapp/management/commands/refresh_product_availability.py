@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from foodcartapp.catalog import refresh_catalog
+from foodcartapp.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает признак «есть в продаже» и число ресторанов у всех товаров'
+
+    def handle(self, *args, **options):
+        products = Product.objects.annotate(
+            actual_count=Count('menu_items', filter=Q(menu_items__availability=True))
+        )
+        drifted_products = [
+            product for product in products
+            if product.available_restaurants_count != product.actual_count
+            or product.is_available != bool(product.actual_count)
+        ]
+        for product in drifted_products:
+            self.stdout.write(
+                f'{product}: записано «есть в продаже» = {product.is_available} '
+                f'в {product.available_restaurants_count} ресторанах, на самом деле в {product.actual_count}'
+            )
+
+        Product.objects.refresh_availability()
+        refresh_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено товаров: {len(drifted_products)}'))
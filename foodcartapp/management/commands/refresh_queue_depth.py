@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from foodcartapp.models import Order, Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает число заказов в очереди у всех ресторанов'
+
+    def handle(self, *args, **options):
+        restaurants = Restaurant.objects.annotate(
+            actual_queue_depth=Count('restaurants', filter=Q(restaurants__status=Order.QUEUED_STATUS))
+        )
+        drifted_restaurants = [
+            restaurant for restaurant in restaurants
+            if restaurant.queue_depth != restaurant.actual_queue_depth
+        ]
+        for restaurant in drifted_restaurants:
+            self.stdout.write(
+                f'{restaurant}: записано {restaurant.queue_depth} заказов в очереди, '
+                f'на самом деле {restaurant.actual_queue_depth}'
+            )
+
+        Restaurant.objects.refresh_queue_depth()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено ресторанов: {len(drifted_restaurants)}'))
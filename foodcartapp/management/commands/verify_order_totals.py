@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохранённую стоимость заказов с суммой по их позициям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Исправить расхождения')
+
+    def handle(self, *args, **options):
+        drifted_orders = list(
+            Order.objects
+            .with_items_cost()
+            .exclude(total_cost=F('items_cost'))
+            .order_by('id')
+        )
+        for order in drifted_orders:
+            self.stdout.write(
+                f'Заказ {order.id}: записано {order.total_cost} руб., по позициям {order.items_cost} руб.'
+            )
+
+        if not drifted_orders:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['fix']:
+            Order.objects.filter(pk__in=[order.pk for order in drifted_orders]).refresh_total_cost()
+            self.stdout.write(self.style.SUCCESS(f'Исправлено заказов: {len(drifted_orders)}'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Заказов с расхождениями: {len(drifted_orders)}. Запустите с --fix, чтобы исправить'
+            ))
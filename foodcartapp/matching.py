@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from .models import OrderItem, RestaurantMenuItem
+
+
+def get_product_restaurants(product_ids=None):
+    product_restaurants = defaultdict(set)
+    menu_items = RestaurantMenuItem.objects.filter(availability=True)
+    if product_ids is not None:
+        menu_items = menu_items.filter(product_id__in=product_ids)
+    menu_items = menu_items.values_list('product_id', 'restaurant_id')
+    for product_id, restaurant_id in menu_items:
+        product_restaurants[product_id].add(restaurant_id)
+
+    return {
+        product_id: frozenset(restaurant_ids)
+        for product_id, restaurant_ids in product_restaurants.items()
+    }
+
+
+def get_order_products(orders):
+    order_products = defaultdict(set)
+    order_items = (
+        OrderItem.objects
+        .filter(order__in=orders)
+        .values_list('order_id', 'product_id')
+    )
+    for order_id, product_id in order_items:
+        order_products[order_id].add(product_id)
+    return order_products
+
+
+def find_capable_restaurants(product_ids, product_restaurants):
+    if not product_ids:
+        return frozenset()
+
+    # Начинаем с самого короткого множества, чтобы пересечение быстрее сошлось к пустому
+    restaurant_sets = sorted(
+        (product_restaurants.get(product_id, frozenset()) for product_id in product_ids),
+        key=len,
+    )
+    capable_restaurants = restaurant_sets[0]
+    for restaurant_ids in restaurant_sets[1:]:
+        if not capable_restaurants:
+            break
+        capable_restaurants = capable_restaurants & restaurant_ids
+    return capable_restaurants
+
+
+def match_orders_with_restaurants(orders):
+    order_products = get_order_products(orders)
+    product_restaurants = get_product_restaurants(set().union(*order_products.values()))
+    return {
+        order.id: find_capable_restaurants(order_products.get(order.id), product_restaurants)
+        for order in orders
+    }
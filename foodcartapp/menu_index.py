@@ -0,0 +1,76 @@
+import json
+import threading
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .catalog import CATALOG_VERSION_KEY, serialize_product
+from .models import Restaurant, RestaurantMenuItem
+from .versions import bump_version, get_versions
+
+
+RestaurantMenu = namedtuple('RestaurantMenu', ['version', 'product_ids', 'content', 'etag'])
+
+
+def get_restaurant_menu_version_key(restaurant_id):
+    return f'restaurant_menu:{restaurant_id}:version'
+
+
+def bump_restaurant_menu_versions(restaurant_ids):
+    for restaurant_id in restaurant_ids:
+        bump_version(get_restaurant_menu_version_key(restaurant_id))
+
+
+class RestaurantMenuIndex:
+    def __init__(self):
+        self._menus = {}
+        self._lock = threading.Lock()
+
+    def get_version(self, restaurant_id):
+        # Меню ресторана зависит и от его собственных пунктов меню, и от карточек товаров
+        restaurant_version_key = get_restaurant_menu_version_key(restaurant_id)
+        versions = get_versions([CATALOG_VERSION_KEY, restaurant_version_key])
+        return f'{versions[CATALOG_VERSION_KEY]}-{versions[restaurant_version_key]}'
+
+    def load_menu(self, restaurant_id, version):
+        restaurant = Restaurant.objects.filter(pk=restaurant_id).first()
+        if not restaurant:
+            return None
+
+        menu_items = (
+            RestaurantMenuItem.objects
+            .filter(restaurant=restaurant, availability=True)
+            .select_related('product__category')
+            .order_by('product_id')
+        )
+        products = [menu_item.product for menu_item in menu_items]
+        content = json.dumps({
+            'restaurant': {
+                'id': restaurant.id,
+                'name': restaurant.name,
+            },
+            'products': [serialize_product(product) for product in products],
+        }, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+        return RestaurantMenu(
+            version=version,
+            product_ids=frozenset(product.id for product in products),
+            content=content,
+            etag=f'"{restaurant_id}-{version}"',
+        )
+
+    def get_menu(self, restaurant_id):
+        version = self.get_version(restaurant_id)
+        menu = self._menus.get(restaurant_id)
+        if menu and menu.version == version:
+            return menu
+
+        menu = self.load_menu(restaurant_id, version)
+        with self._lock:
+            if menu:
+                self._menus[restaurant_id] = menu
+            else:
+                self._menus.pop(restaurant_id, None)
+        return menu
+
+
+restaurant_menu_index = RestaurantMenuIndex()
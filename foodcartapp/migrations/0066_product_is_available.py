@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2023-09-25 14:30
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_product_availability(apps, schema_editor):
+    Product = apps.get_model('foodcartapp', 'Product')
+    RestaurantMenuItem = apps.get_model('foodcartapp', 'RestaurantMenuItem')
+    available_menu_items = (
+        RestaurantMenuItem.objects
+        .filter(product=OuterRef('pk'), availability=True)
+        .order_by()
+        .values('product')
+    )
+    available_restaurants_count = available_menu_items.annotate(count=Count('pk')).values('count')
+    Product.objects.update(
+        available_restaurants_count=Coalesce(Subquery(available_restaurants_count), 0),
+        is_available=Exists(available_menu_items),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0065_product_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='available_restaurants_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='в продаже в ресторанах'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='is_available',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='есть в продаже'),
+        ),
+        migrations.RunPython(fill_product_availability, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.3 on 2023-10-09 12:10
+
+from django.db import migrations
+
+
+# SQL повторяет схему из foodcartapp/search.py на момент миграции. Код приложения и настройки
+# здесь не импортируем: миграция должна выполняться одинаково, как бы они потом ни менялись
+CREATE_INDEX_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS foodcartapp_product_search '
+        "USING fts5(name, category, description, tokenize='unicode61 remove_diacritics 2')",
+        'INSERT INTO foodcartapp_product_search (rowid, name, category, description) '
+        "SELECT product.id, product.name, COALESCE(category.name, ''), product.description "
+        'FROM foodcartapp_product AS product '
+        'LEFT JOIN foodcartapp_productcategory AS category ON category.id = product.category_id',
+    ],
+    'postgresql': [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        'CREATE TABLE IF NOT EXISTS foodcartapp_product_search ('
+        'product_id integer PRIMARY KEY REFERENCES foodcartapp_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        'name text NOT NULL, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS foodcartapp_product_search_document_idx '
+        'ON foodcartapp_product_search USING gin (document)',
+        'CREATE INDEX IF NOT EXISTS foodcartapp_product_search_name_trgm_idx '
+        'ON foodcartapp_product_search USING gin (lower(name) gin_trgm_ops)',
+        'INSERT INTO foodcartapp_product_search (product_id, name, document) '
+        'SELECT product.id, product.name, '
+        "setweight(to_tsvector('russian', product.name), 'A') || "
+        "setweight(to_tsvector('russian', COALESCE(category.name, '')), 'B') || "
+        "setweight(to_tsvector('russian', product.description), 'C') "
+        'FROM foodcartapp_product AS product '
+        'LEFT JOIN foodcartapp_productcategory AS category ON category.id = product.category_id',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    # Для других баз поиск подключается своим бэкендом через PRODUCT_SEARCH_BACKEND,
+    # и индекс строит команда rebuild_search_index
+    for sql in CREATE_INDEX_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_INDEX_SQL:
+        schema_editor.execute('DROP TABLE IF EXISTS foodcartapp_product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0068_banner'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
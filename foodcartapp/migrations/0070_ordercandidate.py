@@ -0,0 +1,29 @@
+# Generated by Django 4.2.3 on 2023-10-12 16:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0069_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCandidate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(blank=True, null=True, verbose_name='расстояние, км')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_candidates', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'ресторан, способный приготовить заказ',
+                'verbose_name_plural': 'рестораны, способные приготовить заказ',
+                'indexes': [models.Index(fields=['order', 'distance'], name='foodcartapp_order_i_fb7ebc_idx')],
+                'unique_together': {('order', 'restaurant')},
+            },
+        ),
+    ]
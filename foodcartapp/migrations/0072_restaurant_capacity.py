@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2023-10-23 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0071_order_total_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Сколько открытых заказов ресторан берёт одновременно. Пусто — без ограничений', null=True, verbose_name='вместимость'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2023-10-26 15:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_queue_depth(apps, schema_editor):
+    Restaurant = apps.get_model('foodcartapp', 'Restaurant')
+    Order = apps.get_model('foodcartapp', 'Order')
+    queued_orders = (
+        Order.objects
+        .filter(restaurant=OuterRef('pk'), status=2)
+        .order_by()
+        .values('restaurant')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Restaurant.objects.update(queue_depth=Coalesce(Subquery(queued_orders), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0072_restaurant_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='queue_depth',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Заказы в статусе «Передан в ресторан». Обновляется при изменении заказов', verbose_name='заказов в очереди'),
+        ),
+        migrations.RunPython(fill_queue_depth, migrations.RunPython.noop),
+    ]
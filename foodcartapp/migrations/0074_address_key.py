@@ -0,0 +1,35 @@
+# Generated by Django 4.2.3 on 2023-10-27 11:40
+
+from django.db import migrations, models
+
+from place.addresses import normalize_address
+
+
+def fill_address_key(apps, schema_editor):
+    for model_name in ['Order', 'Restaurant']:
+        model = apps.get_model('foodcartapp', model_name)
+        objects = list(model.objects.only('address'))
+        for obj in objects:
+            obj.address_key = normalize_address(obj.address)
+        model.objects.bulk_update(objects, ['address_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0073_restaurant_queue_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='address_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='Нормализованный адрес'),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='address_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='нормализованный адрес'),
+        ),
+        migrations.RunPython(fill_address_key, migrations.RunPython.noop),
+    ]
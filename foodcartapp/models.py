@@ -1,9 +1,43 @@
-from django.db import models
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from phonenumber_field.modelfields import PhoneNumberField
-from django.db.models import F, Sum
+from django.db.models import Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import Signal
 from django.utils import timezone
 
+from place.addresses import normalize_address
+
+
+def set_address_key(instance, save_kwargs):
+    # По address_key заказы и рестораны находятся одним запросом, когда у адреса появляются координаты
+    if 'address' in instance.get_deferred_fields():
+        return
+    instance.address_key = normalize_address(instance.address)
+    update_fields = save_kwargs.get('update_fields')
+    if update_fields is not None and 'address' in update_fields:
+        save_kwargs['update_fields'] = {*update_fields, 'address_key'}
+
+
+class RestaurantQuerySet(models.QuerySet):
+    def change_queue_depth(self, delta):
+        return self.update(queue_depth=Greatest(F('queue_depth') + delta, 0))
+
+    def refresh_queue_depth(self):
+        queued_orders = (
+            Order.objects
+            .filter(restaurant=OuterRef('pk'), status=Order.QUEUED_STATUS)
+            .order_by()
+            .values('restaurant')
+            .annotate(count=Count('pk'))
+            .values('count')
+        )
+        return self.update(queue_depth=Coalesce(Subquery(queued_orders), 0))
+
 
 class Restaurant(models.Model):
     name = models.CharField(
@@ -15,11 +49,32 @@ class Restaurant(models.Model):
         max_length=100,
         blank=True,
     )
+    address_key = models.CharField(
+        'нормализованный адрес',
+        max_length=100,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
     contact_phone = models.CharField(
         'контактный телефон',
         max_length=50,
         blank=True,
     )
+    capacity = models.PositiveIntegerField(
+        'вместимость',
+        null=True,
+        blank=True,
+        help_text='Сколько открытых заказов ресторан берёт одновременно. Пусто — без ограничений'
+    )
+    queue_depth = models.PositiveIntegerField(
+        'заказов в очереди',
+        default=0,
+        editable=False,
+        help_text='Заказы в статусе «Передан в ресторан». Обновляется при изменении заказов'
+    )
+
+    objects = RestaurantQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'ресторан'
@@ -28,15 +83,32 @@ class Restaurant(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        set_address_key(self, kwargs)
+        super().save(*args, **kwargs)
+
+
+menu_items_changed = Signal()
+
+LIST_THUMBNAIL_WIDTH = 100
+
 
 class ProductQuerySet(models.QuerySet):
     def available(self):
-        products = (
+        return self.filter(is_available=True)
+
+    def refresh_availability(self):
+        available_menu_items = (
             RestaurantMenuItem.objects
-            .filter(availability=True)
-            .values_list('product')
+            .filter(product=OuterRef('pk'), availability=True)
+            .order_by()
+            .values('product')
+        )
+        available_restaurants_count = available_menu_items.annotate(count=Count('pk')).values('count')
+        return self.update(
+            available_restaurants_count=Coalesce(Subquery(available_restaurants_count), 0),
+            is_available=Exists(available_menu_items),
         )
-        return self.filter(pk__in=products)
 
 
 class ProductCategory(models.Model):
@@ -57,7 +129,8 @@ class ProductCategory(models.Model):
 class Product(models.Model):
     name = models.CharField(
         'название',
-        max_length=50
+        max_length=50,
+        db_index=True
     )
     category = models.ForeignKey(
         ProductCategory,
@@ -86,21 +159,98 @@ class Product(models.Model):
         max_length=300,
         blank=True,
     )
+    is_available = models.BooleanField(
+        'есть в продаже',
+        default=False,
+        editable=False,
+        db_index=True,
+    )
+    available_restaurants_count = models.PositiveIntegerField(
+        'в продаже в ресторанах',
+        default=0,
+        editable=False,
+    )
+    image_variants = models.JSONField(
+        'уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
 
     objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'товар'
         verbose_name_plural = 'товары'
+        indexes = [
+            models.Index(fields=['category', 'id']),
+            models.Index(fields=['special_status', 'id']),
+        ]
 
     def __str__(self):
         return self.name
 
+    def has_image_variants(self):
+        return bool(self.image) and self.image_variants.get('source') == self.image.name
+
+    def get_image_variants(self):
+        if not self.has_image_variants():
+            return []
+        return [
+            {
+                'url': self.image.storage.url(variant['name']),
+                'width': variant['width'],
+                'type': variant['type'],
+            }
+            for variant in self.image_variants['variants']
+        ]
+
+    def get_thumbnail_url(self, width):
+        thumbnails = sorted(
+            (variant for variant in self.get_image_variants() if variant['type'] != 'image/webp'),
+            key=lambda variant: variant['width'],
+        )
+        for thumbnail in thumbnails:
+            if thumbnail['width'] >= width:
+                return thumbnail['url']
+        return self.image.url
+
+    @property
+    def thumbnail_url(self):
+        return self.get_thumbnail_url(LIST_THUMBNAIL_WIDTH)
+
 
 class RestaurantMenuItemQuerySet(models.QuerySet):
     def get_available_items(self):
         return self.filter(availability=True).select_related('restaurant', 'product')
 
+    # Массовые операции не вызывают post_save, поэтому об изменениях меню сообщаем сами
+    def _send_changed(self, menu_items):
+        menu_items_changed.send(
+            sender=RestaurantMenuItem,
+            product_ids={menu_item[0] for menu_item in menu_items},
+            restaurant_ids={menu_item[1] for menu_item in menu_items},
+        )
+
+    def update(self, **kwargs):
+        menu_items = set(self.values_list('product_id', 'restaurant_id'))
+        updated_count = super().update(**kwargs)
+        if menu_items:
+            self._send_changed(menu_items)
+        return updated_count
+
+    def bulk_create(self, objs, *args, **kwargs):
+        menu_items = super().bulk_create(objs, *args, **kwargs)
+        if menu_items:
+            self._send_changed({(menu_item.product_id, menu_item.restaurant_id) for menu_item in menu_items})
+        return menu_items
+
+    def bulk_update(self, objs, *args, **kwargs):
+        updated_count = super().bulk_update(objs, *args, **kwargs)
+        if objs:
+            self._send_changed({(menu_item.product_id, menu_item.restaurant_id) for menu_item in objs})
+        return updated_count
+
 
 class RestaurantMenuItem(models.Model):
     restaurant = models.ForeignKey(
@@ -135,11 +285,41 @@ class RestaurantMenuItem(models.Model):
 
 class OrderQuerySet(models.QuerySet):
 
-    def with_total_cost(self):
-        return self.annotate(total_cost=Sum(F('order_items__price') * F('order_items__quantity')))
+    def with_items_cost(self):
+        return self.annotate(
+            items_cost=Coalesce(Sum(F('order_items__price') * F('order_items__quantity')), Decimal(0))
+        )
+
+    def refresh_total_cost(self):
+        items_cost = (
+            OrderItem.objects
+            .filter(order=OuterRef('pk'))
+            .order_by()
+            .values('order')
+            .annotate(cost=Sum(F('price') * F('quantity')))
+            .values('cost')
+        )
+        return self.update(total_cost=Coalesce(Subquery(items_cost), Decimal(0)))
+
+    def open(self):
+        return self.exclude(status=4)
+
+    def awaiting_dispatch(self):
+        return self.filter(status=0, restaurant__isnull=True)
+
+    def get_restaurant_loads(self):
+        loads = (
+            self.open()
+            .filter(restaurant__isnull=False)
+            .order_by()
+            .values('restaurant')
+            .annotate(orders_count=Count('pk'))
+            .values_list('restaurant', 'orders_count')
+        )
+        return dict(loads)
 
     def get_orders(self):
-        return self.all().prefetch_related('products').exclude(status=4).with_total_cost().order_by('status')
+        return self.open().order_by('status')
 
 
 class Order(models.Model):
@@ -151,6 +331,7 @@ class Order(models.Model):
         (3, 'Передан курьеру'),
         (4, 'Завершен')
     ]
+    QUEUED_STATUS = 2
 
     PAYMENT_METHOD_CHOICES = [
         (0, 'Наличный расчет'),
@@ -187,6 +368,13 @@ class Order(models.Model):
         'Адрес',
         max_length=100
     )
+    address_key = models.CharField(
+        'Нормализованный адрес',
+        max_length=100,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
     phonenumber = PhoneNumberField(
         'Контактный телефон'
     )
@@ -220,11 +408,17 @@ class Order(models.Model):
         blank=True,
         db_index=True
     )
+    total_cost = models.DecimalField(
+        'Стоимость заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False
+    )
     products = models.ManyToManyField(Product, through='OrderItem')
 
     objects = OrderQuerySet.as_manager()
 
-
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
@@ -232,6 +426,38 @@ class Order(models.Model):
     def __str__(self):
         return f'Order #{self.id}: {self.firstname} {self.lastname} - {self.address}'
 
+    def save(self, *args, **kwargs):
+        set_address_key(self, kwargs)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        # Запоминаем, в очереди какого ресторана заказ лежит в базе, чтобы при сохранении поправить счётчики.
+        # Если статус или ресторан отложены через only(), не читаем их: иначе каждый заказ стоит лишний запрос
+        if 'status' in field_names and 'restaurant_id' in field_names:
+            order.saved_queue_restaurant_id = order.get_queue_restaurant_id()
+        return order
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if not self.get_deferred_fields() & {'status', 'restaurant_id'}:
+            self.saved_queue_restaurant_id = self.get_queue_restaurant_id()
+
+    def get_queue_restaurant_id(self):
+        if self.status == self.QUEUED_STATUS:
+            return self.restaurant_id
+        return None
+
+    def load_saved_queue_restaurant_id(self):
+        if hasattr(self, 'saved_queue_restaurant_id'):
+            return self.saved_queue_restaurant_id
+        self.saved_queue_restaurant_id = None
+        if not self._state.adding:
+            saved_order = Order.objects.filter(pk=self.pk).values_list('status', 'restaurant_id').first()
+            if saved_order and saved_order[0] == self.QUEUED_STATUS:
+                self.saved_queue_restaurant_id = saved_order[1]
+        return self.saved_queue_restaurant_id
 
 
 class OrderItem(models.Model):
@@ -268,3 +494,184 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f'{self.order} - {self.product.name} ({self.quantity})'
+
+
+class OrderCandidateQuerySet(models.QuerySet):
+    def with_score(self, distance_weight=None, load_weight=None):
+        # Чем меньше оценка, тем лучше: каждый заказ в очереди ресторана весит как load_weight км пути
+        if distance_weight is None:
+            distance_weight = settings.ROUTING_DISTANCE_WEIGHT
+        if load_weight is None:
+            load_weight = settings.ROUTING_LOAD_WEIGHT
+        return self.annotate(score=ExpressionWrapper(
+            F('distance') * distance_weight + F('restaurant__queue_depth') * load_weight,
+            output_field=FloatField(),
+        ))
+
+
+class OrderCandidate(models.Model):
+    order = models.ForeignKey(
+        Order,
+        related_name='candidates',
+        verbose_name='заказ',
+        on_delete=models.CASCADE
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        related_name='order_candidates',
+        verbose_name='ресторан',
+        on_delete=models.CASCADE
+    )
+    distance = models.FloatField(
+        'расстояние, км',
+        null=True,
+        blank=True
+    )
+
+    objects = OrderCandidateQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ресторан, способный приготовить заказ'
+        verbose_name_plural = 'рестораны, способные приготовить заказ'
+        unique_together = [
+            ['order', 'restaurant']
+        ]
+        indexes = [
+            models.Index(fields=['order', 'distance']),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id} - {self.restaurant_id}'
+
+
+class Banner(models.Model):
+    title = models.CharField(
+        'заголовок',
+        max_length=50
+    )
+    image = models.ImageField(
+        'картинка',
+        upload_to='banners'
+    )
+    text = models.CharField(
+        'текст',
+        max_length=200,
+        blank=True
+    )
+    position = models.PositiveIntegerField(
+        'порядок',
+        default=0,
+        db_index=True
+    )
+    active_from = models.DateTimeField(
+        'показывать с',
+        null=True,
+        blank=True
+    )
+    active_until = models.DateTimeField(
+        'показывать до',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'баннер'
+        verbose_name_plural = 'баннеры'
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.title
+
+    def is_active(self, now):
+        started = not self.active_from or self.active_from <= now
+        finished = self.active_until and self.active_until <= now
+        return started and not finished
+
+
+class CacheVersionQuerySet(models.QuerySet):
+    def get_versions(self, keys, initial_version):
+        keys = set(keys)
+        versions = dict(self.filter(key__in=keys).values_list('key', 'version'))
+        missing_keys = keys - versions.keys()
+        if missing_keys:
+            self.bulk_create(
+                [CacheVersion(key=key, version=initial_version) for key in missing_keys],
+                ignore_conflicts=True,
+            )
+            versions.update(self.filter(key__in=missing_keys).values_list('key', 'version'))
+        return versions
+
+    def bump(self, key, initial_version):
+        if not self.filter(key=key).update(version=F('version') + 1):
+            self.bulk_create([CacheVersion(key=key, version=initial_version)], ignore_conflicts=True)
+
+
+class CacheVersion(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=100,
+        unique=True
+    )
+    version = models.BigIntegerField(
+        'версия'
+    )
+
+    objects = CacheVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'версия кэша'
+        verbose_name_plural = 'версии кэша'
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    def expired(self, ttl):
+        return self.filter(created_at__lt=timezone.now() - ttl)
+
+    def lock(self, key, request_hash):
+        try:
+            with transaction.atomic():
+                return self.create(key=key, request_hash=request_hash), True
+        except IntegrityError:
+            # Такой же запрос уже сохранён. Если он ещё выполняется в параллельной транзакции,
+            # вставка ждёт её завершения, поэтому здесь мы видим уже готовый ответ
+            return self.get(key=key), False
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField(
+        'ключ',
+        max_length=255,
+        unique=True
+    )
+    request_hash = models.CharField(
+        'хэш запроса',
+        max_length=64
+    )
+    response_status = models.PositiveSmallIntegerField(
+        'код ответа',
+        null=True,
+        blank=True
+    )
+    response_body = models.JSONField(
+        'ответ',
+        encoder=DjangoJSONEncoder,
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(
+        'создан',
+        default=timezone.now,
+        db_index=True
+    )
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
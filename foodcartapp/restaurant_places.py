@@ -0,0 +1,82 @@
+import threading
+
+from django.conf import settings
+
+from place.cache import geocode_cache
+from place.spatial import GridIndex
+
+from .models import Restaurant
+from .versions import bump_version, get_version
+
+
+RESTAURANT_PLACES_VERSION_KEY = 'restaurant_places:version'
+
+
+def bump_restaurant_places_version():
+    bump_version(RESTAURANT_PLACES_VERSION_KEY)
+
+
+def invalidate_restaurant_places():
+    # Версия лежит в базе: текущий процесс сразу пересоберёт индекс с данными своей транзакции,
+    # а остальные увидят новую версию только после коммита, вместе с новыми данными
+    bump_restaurant_places_version()
+
+
+class RestaurantPlaces:
+    def __init__(self, index, restaurant_points):
+        self.index = index
+        self.restaurant_points = restaurant_points
+
+    def find_nearest(self, coordinates, restaurant_ids, k=None, max_distance_km=None):
+        nearest_restaurants = self.index.nearest(
+            coordinates,
+            k or settings.ORDER_CANDIDATES_LIMIT,
+            max_distance_km=max_distance_km or settings.ORDER_CANDIDATES_MAX_DISTANCE_KM,
+            allowed_ids=restaurant_ids,
+        )
+        return [
+            (restaurant_id, *self.restaurant_points[restaurant_id])
+            for restaurant_id, _ in nearest_restaurants
+        ]
+
+
+class RestaurantPlacesIndex:
+    def __init__(self):
+        self.version = None
+        self._state = None
+        self._lock = threading.Lock()
+
+    def build_index(self):
+        restaurants = dict(Restaurant.objects.values_list('id', 'address'))
+        points = geocode_cache.get_points(restaurants.values())
+        restaurant_points = {
+            restaurant_id: points[address]
+            for restaurant_id, address in restaurants.items()
+            if address in points
+        }
+        # Кандидатов отбираем по быстрой формуле гаверсинусов,
+        # а точное расстояние для сохранения берётся из place_distance_cache
+        index = GridIndex(
+            (
+                (restaurant_id, coordinates)
+                for restaurant_id, (_, coordinates) in restaurant_points.items()
+            ),
+            cell_size_km=settings.RESTAURANT_INDEX_CELL_KM,
+        )
+        return RestaurantPlaces(index, restaurant_points)
+
+    def get_state(self):
+        # Версию читаем из базы, поэтому вызывайте один раз на пачку заказов, а не на каждый заказ
+        version = get_version(RESTAURANT_PLACES_VERSION_KEY)
+        state = self._state
+        if state is not None and self.version == version:
+            return state
+
+        with self._lock:
+            if self._state is None or self.version != version:
+                self._state = self.build_index()
+                self.version = version
+            return self._state
+
+
+restaurant_places_index = RestaurantPlacesIndex()
@@ -0,0 +1,183 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+SEARCH_TABLE = 'foodcartapp_product_search'
+
+
+def get_search_terms(query):
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def get_document(product):
+    return {
+        'product_id': product.id,
+        'name': product.name,
+        'category': product.category.name if product.category else '',
+        'description': product.description,
+    }
+
+
+class SqliteFtsBackend:
+    def create_index(self, cursor):
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+            "USING fts5(name, category, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def remove_products(self, cursor, product_ids):
+        cursor.executemany(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [[pk] for pk in product_ids])
+
+    def index_products(self, cursor, documents):
+        self.remove_products(cursor, [document['product_id'] for document in documents])
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, name, category, description) VALUES (%s, %s, %s, %s)',
+            [
+                [document['product_id'], document['name'], document['category'], document['description']]
+                for document in documents
+            ],
+        )
+
+    def search(self, cursor, terms, limit, available_only):
+        # Каждое слово ищем как префикс: «чиз» найдёт «Чизбургер». Кавычки удваиваем по правилам FTS5
+        match_query = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        availability_filter = 'AND product.is_available' if available_only else ''
+        cursor.execute(
+            f'SELECT search.rowid FROM {SEARCH_TABLE} AS search '
+            f'JOIN foodcartapp_product AS product ON product.id = search.rowid '
+            f'WHERE {SEARCH_TABLE} MATCH %s {availability_filter} '
+            # Совпадение в названии весит больше, чем в категории и описании
+            f'ORDER BY bm25({SEARCH_TABLE}, 10.0, 2.0, 1.0) LIMIT %s',
+            [match_query, limit],
+        )
+        return [product_id for product_id, in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    document_sql = (
+        "setweight(to_tsvector('russian', %s), 'A') || "
+        "setweight(to_tsvector('russian', %s), 'B') || "
+        "setweight(to_tsvector('russian', %s), 'C')"
+    )
+
+    def create_index(self, cursor):
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            'product_id integer PRIMARY KEY REFERENCES foodcartapp_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'name text NOT NULL, '
+            'document tsvector NOT NULL)'
+        )
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx ON {SEARCH_TABLE} USING gin (document)'
+        )
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_name_trgm_idx ON {SEARCH_TABLE} '
+            'USING gin (lower(name) gin_trgm_ops)'
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def remove_products(self, cursor, product_ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)', [list(product_ids)])
+
+    def index_products(self, cursor, documents):
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (product_id, name, document) '
+            f'VALUES (%s, %s, {self.document_sql}) '
+            'ON CONFLICT (product_id) DO UPDATE SET name = EXCLUDED.name, document = EXCLUDED.document',
+            [
+                [
+                    document['product_id'],
+                    document['name'],
+                    document['name'],
+                    document['category'],
+                    document['description'],
+                ]
+                for document in documents
+            ],
+        )
+
+    def search(self, cursor, terms, limit, available_only):
+        # Префиксный поиск по словам с русской морфологией, а триграммы ловят опечатки в названии
+        ts_query = ' & '.join(f'{term}:*' for term in terms)
+        name_query = ' '.join(terms)
+        availability_filter = 'AND product.is_available' if available_only else ''
+        cursor.execute(
+            f'SELECT search.product_id FROM {SEARCH_TABLE} AS search '
+            'JOIN foodcartapp_product AS product ON product.id = search.product_id, '
+            "to_tsquery('russian', %s) AS query "
+            f'WHERE (search.document @@ query OR lower(search.name) %% %s) {availability_filter} '
+            'ORDER BY ts_rank(search.document, query) + similarity(lower(search.name), %s) DESC '
+            'LIMIT %s',
+            [ts_query, name_query, name_query, limit],
+        )
+        return [product_id for product_id, in cursor.fetchall()]
+
+
+DEFAULT_BACKENDS = {
+    'sqlite': SqliteFtsBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    if settings.PRODUCT_SEARCH_BACKEND:
+        return import_string(settings.PRODUCT_SEARCH_BACKEND)()
+
+    vendor = connection.vendor
+    if vendor not in DEFAULT_BACKENDS:
+        raise ImproperlyConfigured(f'Поиск товаров не поддерживает базу данных {vendor}')
+    return DEFAULT_BACKENDS[vendor]()
+
+
+def fill_search_index(backend, cursor, products, chunk_size=500):
+    documents = []
+    for product in products:
+        documents.append(get_document(product))
+        if len(documents) == chunk_size:
+            backend.index_products(cursor, documents)
+            documents = []
+    if documents:
+        backend.index_products(cursor, documents)
+
+
+def rebuild_search_index():
+    backend = get_search_backend()
+    products = Product.objects.select_related('category').order_by('id')
+    with connection.cursor() as cursor:
+        backend.drop_index(cursor)
+        backend.create_index(cursor)
+        fill_search_index(backend, cursor, products.iterator())
+    return products.count()
+
+
+def index_products(products):
+    documents = [get_document(product) for product in products]
+    if documents:
+        with connection.cursor() as cursor:
+            get_search_backend().index_products(cursor, documents)
+
+
+def remove_products(product_ids):
+    if product_ids:
+        with connection.cursor() as cursor:
+            get_search_backend().remove_products(cursor, product_ids)
+
+
+def search_products(query, limit=20, available_only=True):
+    terms = get_search_terms(query)
+    if not terms:
+        return []
+    with connection.cursor() as cursor:
+        return get_search_backend().search(cursor, terms, limit, available_only)
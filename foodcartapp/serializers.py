@@ -1,11 +1,46 @@
-from rest_framework.serializers import ModelSerializer
+import base64
+import binascii
 
-from .models import Order, OrderItem
+from rest_framework.serializers import (
+    BooleanField, CharField, IntegerField, ListField, ModelSerializer, Serializer, ValidationError
+)
+
+from place.addresses import normalize_address
+from place.models import Place
+
+from .candidates import update_order_candidates
+from .models import Order, OrderItem, Product, Restaurant
+
+
+def bulk_create_orders(validated_orders):
+    orders = [
+        Order(
+            address_key=normalize_address(validated_order['address']),
+            total_cost=sum(product['product'].price * product['quantity'] for product in validated_order['products']),
+            **{field: value for field, value in validated_order.items() if field != 'products'}
+        )
+        for validated_order in validated_orders
+    ]
+    Order.objects.bulk_create(orders)
+    # bulk_create не отправляет post_save, поэтому адреса в очередь геокодирования ставим сами
+    Place.objects.enqueue(order.address for order in orders)
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            price=product['product'].price,
+            **product
+        )
+        for order, validated_order in zip(orders, validated_orders)
+        for product in validated_order['products']
+    ])
+
+    update_order_candidates(orders)
+    return orders
 
 
 class OrderItemSerializer(ModelSerializer):
-    def create(self, validated_data):
-        return OrderItem.objects.create(**validated_data)
+    product = IntegerField(min_value=1)
 
     class Meta:
         model = OrderItem
@@ -15,19 +50,80 @@ class OrderItemSerializer(ModelSerializer):
 class OrderSerializer(ModelSerializer):
     products = OrderItemSerializer(many=True, allow_empty=False, write_only=True)
 
-    def create(self, validated_data):
-        products = validated_data.pop('products')
-        order = Order.objects.create(**validated_data)
+    def validate_products(self, items):
+        # Все товары заказа достаём одним запросом вместо запроса на каждую позицию.
+        # При пакетной загрузке товары всех заказов уже загружены и лежат в контексте
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.in_bulk({item['product'] for item in items})
+
+        errors = [
+            {} if item['product'] in products
+            else {'product': [f'Недопустимый первичный ключ "{item["product"]}" - объект не существует.']}
+            for item in items
+        ]
+        if any(errors):
+            raise ValidationError(errors)
 
-        for product in products:
-            OrderItem.objects.create(
-                order=order,
-                price=product['product'].price,
-                **product
-            )
+        return [{**item, 'product': products[item['product']]} for item in items]
 
+    def create(self, validated_data):
+        order, = bulk_create_orders([validated_data])
         return order
 
     class Meta:
         model = Order
         fields = ['id', 'firstname', 'lastname', 'address', 'phonenumber', 'products']
+
+
+class DispatchOrdersSerializer(Serializer):
+    dry_run = BooleanField(default=False)
+
+
+class ProductSearchSerializer(Serializer):
+    q = CharField(max_length=100)
+    limit = IntegerField(required=False, min_value=1, max_value=100, default=20)
+
+
+class ProductFilterSerializer(Serializer):
+    category = IntegerField(required=False, min_value=1)
+    special_status = BooleanField(required=False)
+    q = CharField(required=False, allow_blank=True, max_length=50)
+    cursor = CharField(required=False)
+    limit = IntegerField(required=False, min_value=1, max_value=100, default=20)
+
+    def validate_cursor(self, cursor):
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, binascii.Error):
+            raise ValidationError('Некорректный курсор.')
+
+
+class MenuCellSerializer(Serializer):
+    restaurant = IntegerField(min_value=1)
+    product = IntegerField(min_value=1)
+
+
+class MenuAvailabilitySerializer(Serializer):
+    availability = BooleanField()
+    items = ListField(child=MenuCellSerializer(), allow_empty=False, max_length=10000)
+
+    def validate_items(self, items):
+        # Проверяем существование всех ресторанов и товаров двумя запросами, а не по запросу на ячейку
+        restaurant_ids = {item['restaurant'] for item in items}
+        product_ids = {item['product'] for item in items}
+        existing_restaurant_ids = set(Restaurant.objects.filter(pk__in=restaurant_ids).values_list('pk', flat=True))
+        existing_product_ids = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['restaurant'] not in existing_restaurant_ids:
+                item_errors['restaurant'] = [f'Недопустимый первичный ключ "{item["restaurant"]}" - объект не существует.']
+            if item['product'] not in existing_product_ids:
+                item_errors['product'] = [f'Недопустимый первичный ключ "{item["product"]}" - объект не существует.']
+            errors.append(item_errors)
+        if any(errors):
+            raise ValidationError(errors)
+
+        return {(item['restaurant'], item['product']) for item in items}
@@ -0,0 +1,169 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from place.models import Place, places_geocoded
+
+from .banners import invalidate_banners
+from .candidates import (
+    update_candidates_for_places, update_candidates_for_products, update_candidates_for_restaurants
+)
+from .catalog import refresh_catalog, schedule_catalog_refresh
+from .menu_index import bump_restaurant_menu_versions
+from .restaurant_places import bump_restaurant_places_version
+from .search import index_products, remove_products
+from .thumbnails import update_product_image_variants
+from .models import (
+    Banner, Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem, menu_items_changed
+)
+
+
+@receiver(post_save, sender=Restaurant)
+def enqueue_restaurant_place(sender, instance, **kwargs):
+    Place.objects.enqueue([instance.address])
+
+
+@receiver(post_save, sender=Order)
+def enqueue_order_place(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and 'address' not in update_fields:
+        return
+    Place.objects.enqueue([instance.address])
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant_menu(sender, instance, **kwargs):
+    transaction.on_commit(lambda: bump_restaurant_menu_versions([instance.pk]))
+
+
+@receiver(post_delete, sender=Restaurant)
+def invalidate_restaurant_places(sender, **kwargs):
+    transaction.on_commit(bump_restaurant_places_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductCategory)
+@receiver(post_delete, sender=ProductCategory)
+def invalidate_catalog(sender, **kwargs):
+    schedule_catalog_refresh()
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def reset_banners(sender, **kwargs):
+    transaction.on_commit(invalidate_banners)
+
+
+@receiver(post_save, sender=RestaurantMenuItem)
+@receiver(post_delete, sender=RestaurantMenuItem)
+def send_menu_item_changed(sender, instance, **kwargs):
+    menu_items_changed.send(
+        sender=sender,
+        product_ids={instance.product_id},
+        restaurant_ids={instance.restaurant_id},
+    )
+
+
+@receiver(menu_items_changed, sender=RestaurantMenuItem)
+def refresh_product_availability(sender, product_ids, **kwargs):
+    Product.objects.filter(pk__in=product_ids).refresh_availability()
+    schedule_catalog_refresh()
+
+
+@receiver(post_save, sender=Product)
+def update_image_variants(sender, instance, **kwargs):
+    if not instance.image or instance.has_image_variants():
+        return
+
+    def update_and_refresh_catalog():
+        if update_product_image_variants(instance):
+            refresh_catalog()
+
+    transaction.on_commit(update_and_refresh_catalog)
+
+
+@receiver(menu_items_changed, sender=RestaurantMenuItem)
+def invalidate_restaurant_menus(sender, restaurant_ids, **kwargs):
+    transaction.on_commit(lambda: bump_restaurant_menu_versions(restaurant_ids))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_index(sender, instance, **kwargs):
+    remove_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductCategory)
+def index_category_products(sender, instance, **kwargs):
+    index_products(instance.products.select_related('category'))
+
+
+@receiver(post_delete, sender=ProductCategory)
+def index_uncategorized_products(sender, **kwargs):
+    # Товары удалённой категории остаются без категории, но какие именно — после удаления уже не узнать
+    index_products(Product.objects.filter(category__isnull=True))
+
+
+@receiver(menu_items_changed, sender=RestaurantMenuItem)
+def update_menu_order_candidates(sender, product_ids, **kwargs):
+    update_candidates_for_products(product_ids)
+
+
+@receiver(post_save, sender=Restaurant)
+def update_restaurant_order_candidates(sender, instance, created, **kwargs):
+    if not created:
+        update_candidates_for_restaurants([instance.pk])
+
+
+@receiver(places_geocoded, sender=Place)
+def update_place_order_candidates(sender, address_keys, **kwargs):
+    update_candidates_for_places(address_keys)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_order_total_cost(sender, instance, **kwargs):
+    Order.objects.filter(pk=instance.order_id).refresh_total_cost()
+
+
+def changes_order_queue(update_fields):
+    # Сохранение только части полей, без статуса и ресторана, очередь не трогает
+    return update_fields is None or bool(update_fields & {'status', 'restaurant', 'restaurant_id'})
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_queue(sender, instance, update_fields, **kwargs):
+    if changes_order_queue(update_fields):
+        instance.load_saved_queue_restaurant_id()
+
+
+@receiver(post_save, sender=Order)
+def update_restaurant_queue_depth(sender, instance, update_fields, **kwargs):
+    if not changes_order_queue(update_fields):
+        return
+    saved_restaurant_id = instance.load_saved_queue_restaurant_id()
+    restaurant_id = instance.get_queue_restaurant_id()
+    if saved_restaurant_id == restaurant_id:
+        return
+    if saved_restaurant_id:
+        Restaurant.objects.filter(pk=saved_restaurant_id).change_queue_depth(-1)
+    if restaurant_id:
+        Restaurant.objects.filter(pk=restaurant_id).change_queue_depth(1)
+    instance.saved_queue_restaurant_id = restaurant_id
+
+
+@receiver(pre_delete, sender=Order)
+def remember_deleted_order_queue(sender, instance, **kwargs):
+    instance.load_saved_queue_restaurant_id()
+
+
+@receiver(post_delete, sender=Order)
+def release_restaurant_queue(sender, instance, **kwargs):
+    saved_restaurant_id = instance.load_saved_queue_restaurant_id()
+    if saved_restaurant_id:
+        Restaurant.objects.filter(pk=saved_restaurant_id).change_queue_depth(-1)
@@ -0,0 +1,87 @@
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FORMATS = {
+    'JPEG': ('jpg', 'image/jpeg'),
+    'PNG': ('png', 'image/png'),
+    'WEBP': ('webp', 'image/webp'),
+}
+
+
+def save_variant(storage, name, image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(buffer, image_format, quality=85, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, image_format, quality=80, method=6)
+    else:
+        image.save(buffer, image_format, optimize=True)
+
+    # Storage.save() не перезаписывает файлы, а подбирает новое имя — старый вариант удаляем сами
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_image_variants(image_field):
+    storage = image_field.storage
+    with image_field.open('rb') as file:
+        image = Image.open(file)
+        image.load()
+
+    source_format = image.format if image.format in ('JPEG', 'PNG') else 'JPEG'
+    base_name = os.path.join(settings.THUMBNAILS_DIR, os.path.splitext(image_field.name)[0])
+
+    variants = []
+    for width in settings.PRODUCT_THUMBNAIL_WIDTHS:
+        if width > image.width:
+            continue
+        resized_image = image.copy()
+        resized_image.thumbnail((width, image.height), Image.LANCZOS)
+        for image_format in (source_format, 'WEBP'):
+            extension, content_type = IMAGE_FORMATS[image_format]
+            name = save_variant(storage, f'{base_name}_{width}w.{extension}', resized_image, image_format)
+            variants.append({
+                'name': name,
+                'width': resized_image.width,
+                'type': content_type,
+            })
+
+    return {
+        'source': image_field.name,
+        'variants': variants,
+    }
+
+
+def delete_image_variants(storage, image_variants, keep_names=()):
+    for variant in image_variants.get('variants', []):
+        if variant['name'] not in keep_names and storage.exists(variant['name']):
+            storage.delete(variant['name'])
+
+
+def update_product_image_variants(product):
+    old_image_variants = product.image_variants
+    try:
+        image_variants = generate_image_variants(product.image)
+    except (OSError, ValueError):
+        logger.exception('Не удалось нарезать превью картинки товара %s', product.pk)
+        return False
+
+    Product.objects.filter(pk=product.pk).update(image_variants=image_variants)
+    product.image_variants = image_variants
+
+    old_source = old_image_variants.get('source')
+    if old_source and not Product.objects.filter(image=old_source).exists():
+        new_names = {variant['name'] for variant in image_variants['variants']}
+        delete_image_variants(product.image.storage, old_image_variants, keep_names=new_names)
+    return True
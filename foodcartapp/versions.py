@@ -0,0 +1,25 @@
+import time
+
+from .models import CacheVersion
+
+
+# Версии лежат в базе, а не в кэше: кэш по умолчанию свой у каждого процесса,
+# и версию, поднятую воркером или другим процессом gunicorn, остальные бы не увидели
+
+
+def get_initial_version():
+    # Данные в общем кэше могли пережить пересоздание базы. Начинаем счётчик с текущего времени,
+    # чтобы новая версия не совпала со старыми ключами, которые ещё лежат в кэше
+    return time.time_ns() // 1000
+
+
+def get_versions(keys):
+    return CacheVersion.objects.get_versions(keys, get_initial_version())
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+def bump_version(key):
+    CacheVersion.objects.bump(key, get_initial_version())
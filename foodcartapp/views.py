@@ -1,117 +1,270 @@
-import requests
+import base64
+import hashlib
+import json
+import logging
 
-from django.http import JsonResponse
-from django.templatetags.static import static
-from django.db import transaction
-from rest_framework.decorators import api_view
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, JsonResponse
+from django.db import DatabaseError, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from geopy import distance
-from environs import Env
-
-from .serializers import OrderSerializer
-from .models import Product
-from place.models import Place
-
-
-def create_place(address):
-    env = Env()
-    env.read_env()
-    yandex_geocoder_api_key = env.str('YANDEX_GEOCODER_API_KEY')
-    place = Place.objects.filter(address=address)
-    if not place:
-        coordinates = fetch_coordinates(yandex_geocoder_api_key, address)
-        if coordinates:
-            Place.objects.create(
-                address=address,
-                lat=coordinates[1],
-                lon=coordinates[0],
-            )
-        else:
-            Place.objects.create(
-                address=address,
-            )
-
+from .banners import get_banners
+from .availability import set_menu_availability
+from .catalog import catalog_snapshot, get_catalog, serialize_product
+from .dispatch import dispatch_orders
+from .menu_index import restaurant_menu_index
+from .search import search_products
+from .serializers import (
+    DispatchOrdersSerializer, MenuAvailabilitySerializer, OrderSerializer, ProductFilterSerializer,
+    ProductSearchSerializer, bulk_create_orders
+)
+from .models import IdempotencyKey, Product
 
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
 
-    if not found_places:
-        return None
+logger = logging.getLogger(__name__)
 
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+PRODUCT_FILTER_PARAMS = {'category', 'special_status', 'q', 'cursor', 'limit'}
+PRODUCT_FILTER_SEARCH_LIMIT = 1000
 
 
 def banners_list_api(request):
-    # FIXME move data to db?
-    return JsonResponse([
-        {
-            'title': 'Burger',
-            'src': static('burger.jpg'),
-            'text': 'Tasty Burger at your door step',
-        },
-        {
-            'title': 'Spices',
-            'src': static('food.jpg'),
-            'text': 'All Cuisines',
-        },
-        {
-            'title': 'New York',
-            'src': static('tasty.jpg'),
-            'text': 'Food is incomplete without a tasty dessert',
-        }
-    ], safe=False, json_dumps_params={
+    banners = get_banners()
+
+    response = get_conditional_response(request, etag=banners['etag'])
+    if response is None:
+        response = HttpResponse(banners['content'], content_type='application/json')
+    response['ETag'] = banners['etag']
+    patch_cache_control(response, public=True, max_age=settings.BANNERS_MAX_AGE)
+    return response
+
+
+def encode_cursor(product_id):
+    return base64.urlsafe_b64encode(str(product_id).encode()).decode()
+
+
+def filtered_product_list_api(request):
+    params = ProductFilterSerializer(data=request.GET.dict())
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=status.HTTP_400_BAD_REQUEST)
+    filters = params.validated_data
+
+    products = Product.objects.select_related('category').available().order_by('id')
+    if 'category' in filters:
+        products = products.filter(category_id=filters['category'])
+    if 'special_status' in filters:
+        products = products.filter(special_status=filters['special_status'])
+    if filters.get('q'):
+        # Поиск идёт по индексу из search.py: istartswith не использует индекс и не различает регистр кириллицы в SQLite
+        product_ids = search_products(filters['q'], limit=PRODUCT_FILTER_SEARCH_LIMIT)
+        products = products.filter(pk__in=product_ids)
+    if 'cursor' in filters:
+        products = products.filter(id__gt=filters['cursor'])
+
+    limit = filters['limit']
+    page = list(products[:limit + 1])
+    next_url = None
+    if len(page) > limit:
+        page = page[:limit]
+        query = request.GET.copy()
+        query['cursor'] = encode_cursor(page[-1].id)
+        next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+    return JsonResponse({
+        'results': [serialize_product(product) for product in page],
+        'next': next_url,
+    }, json_dumps_params={
         'ensure_ascii': False,
-        'indent': 4,
     })
 
 
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
+    # Посторонние параметры вроде utm-меток не должны менять формат ответа и уводить мимо кэшированного снимка
+    if PRODUCT_FILTER_PARAMS & request.GET.keys():
+        return filtered_product_list_api(request)
+
+    if catalog_snapshot.load():
+        etag = catalog_snapshot.etag
+        last_modified = catalog_snapshot.last_modified
+        encoding, content = catalog_snapshot.get_variant(request.headers.get('Accept-Encoding', ''))
+    else:
+        catalog = get_catalog()
+        etag = catalog['etag']
+        last_modified = int(catalog['last_modified'].timestamp())
+        encoding, content = None, catalog['content']
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def product_search_api(request):
+    params = ProductSearchSerializer(data=request.GET.dict())
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    product_ids = search_products(params.validated_data['q'], limit=params.validated_data['limit'])
+    products = Product.objects.select_related('category').in_bulk(product_ids)
+    return JsonResponse({
+        'results': [serialize_product(products[product_id]) for product_id in product_ids if product_id in products],
+    }, json_dumps_params={
         'ensure_ascii': False,
-        'indent': 4,
     })
 
 
+def restaurant_menu_api(request, restaurant_id):
+    menu = restaurant_menu_index.get_menu(restaurant_id)
+    if not menu:
+        raise Http404('Ресторан не найден')
+
+    response = get_conditional_response(request, etag=menu.etag)
+    if response is None:
+        response = HttpResponse(menu.content, content_type='application/json')
+    response['ETag'] = menu.etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def get_request_hash(data):
+    dumped_data = json.dumps(data, sort_keys=True, ensure_ascii=False, cls=DjangoJSONEncoder)
+    return hashlib.sha256(dumped_data.encode()).hexdigest()
+
+
 @transaction.atomic
 @api_view(['POST'])
 def register_order(request):
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        request_hash = get_request_hash(request.data)
+        IdempotencyKey.objects.expired(settings.IDEMPOTENCY_KEY_TTL).delete()
+        stored_request, created = IdempotencyKey.objects.lock(idempotency_key, request_hash)
+        if not created:
+            if stored_request.request_hash != request_hash:
+                return Response(
+                    {'detail': 'Ключ Idempotency-Key уже использован для другого заказа.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            return Response(stored_request.response_body, status=stored_request.response_status)
+
     serializer = OrderSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
+    if serializer.is_valid():
+        order = serializer.save()
+        response = Response(OrderSerializer(order).data)
+    else:
+        response = Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if idempotency_key:
+        stored_request.response_status = response.status_code
+        stored_request.response_body = response.data
+        stored_request.save(update_fields=['response_status', 'response_body'])
+
+    return response
+
+
+def get_batch_product_ids(orders_data):
+    product_ids = set()
+    for order_data in orders_data:
+        if not isinstance(order_data, dict) or not isinstance(order_data.get('products'), list):
+            continue
+        for item in order_data['products']:
+            if not isinstance(item, dict):
+                continue
+            try:
+                product_ids.add(int(item.get('product')))
+            except (TypeError, ValueError):
+                continue
+    return product_ids
+
+
+@api_view(['POST'])
+def register_orders_batch(request):
+    orders_data = request.data
+    if not isinstance(orders_data, list) or not orders_data:
+        return Response({'detail': 'Ожидается непустой список заказов.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(orders_data) > settings.ORDER_BATCH_MAX_SIZE:
+        return Response(
+            {'detail': f'В одном запросе не больше {settings.ORDER_BATCH_MAX_SIZE} заказов.'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    products = Product.objects.in_bulk(get_batch_product_ids(orders_data))
+    results = [None] * len(orders_data)
+    valid_orders = []
+    for index, order_data in enumerate(orders_data):
+        serializer = OrderSerializer(data=order_data, context={'products': products})
+        if serializer.is_valid():
+            valid_orders.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'errors': serializer.errors}
 
-    order = serializer.save()
-    serialized_order = OrderSerializer(order).data
-    create_place(serialized_order['address'])
+    chunk_size = settings.ORDER_BATCH_CHUNK_SIZE
+    for chunk_start in range(0, len(valid_orders), chunk_size):
+        chunk = valid_orders[chunk_start:chunk_start + chunk_size]
+        try:
+            with transaction.atomic():
+                orders = bulk_create_orders([validated_order for _, validated_order in chunk])
+        except DatabaseError as error:
+            logger.exception('Не удалось сохранить пачку заказов')
+            for index, _ in chunk:
+                results[index] = {'index': index, 'errors': {'non_field_errors': [str(error)]}}
+            continue
 
-    return Response(serialized_order)
+        for (index, _), order in zip(chunk, orders):
+            results[index] = {'index': index, 'id': order.id}
+
+    created_count = sum('id' in result for result in results)
+    if created_count == len(results):
+        response_status = status.HTTP_201_CREATED
+    elif created_count:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response({'results': results}, status=response_status)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def dispatch_orders_api(request):
+    serializer = DispatchOrdersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    assignments, unassigned_order_ids = dispatch_orders(dry_run=serializer.validated_data['dry_run'])
+    return Response({
+        'assigned': [
+            {
+                'order': assignment.order_id,
+                'restaurant': assignment.restaurant_id,
+                'distance': round(assignment.distance, 2),
+                'score': round(assignment.score, 2),
+            }
+            for assignment in assignments
+        ],
+        'unassigned': unassigned_order_ids,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def menu_availability_api(request):
+    serializer = MenuAvailabilitySerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    changed_count = set_menu_availability(
+        serializer.validated_data['items'],
+        serializer.validated_data['availability'],
+    )
+    return Response({'changed': changed_count})
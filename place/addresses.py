@@ -0,0 +1,25 @@
+import re
+
+
+ADDRESS_ABBREVIATIONS = {
+    'город': 'г',
+    'улица': 'ул',
+    'проспект': 'пр-т',
+    'пр': 'пр-т',
+    'переулок': 'пер',
+    'бульвар': 'б-р',
+    'шоссе': 'ш',
+    'площадь': 'пл',
+    'набережная': 'наб',
+    'проезд': 'пр-д',
+    'дом': 'д',
+    'корпус': 'к',
+    'корп': 'к',
+    'строение': 'стр',
+    'квартира': 'кв',
+}
+
+
+def normalize_address(address):
+    words = re.findall(r'[\w-]+', address.lower().replace('ё', 'е'))
+    return ' '.join(ADDRESS_ABBREVIATIONS.get(word, word) for word in words)
@@ -5,4 +5,16 @@ from .models import Place
 
 @admin.register(Place)
 class PlaceAdmin(admin.ModelAdmin):
-    pass
+    list_display = [
+        'address',
+        'lat',
+        'lon',
+        'status',
+        'geocode_date',
+    ]
+    list_filter = [
+        'status',
+    ]
+    search_fields = [
+        'address',
+    ]
@@ -0,0 +1,245 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .addresses import normalize_address
+from .distance import get_distance_matrix
+from .models import Place, PlaceDistance
+
+
+class PlaceChangesTracker:
+    # Координаты меняет воркер геокодера или админка в другом процессе. По отметке
+    # Place.coordinates_updated_at каждый процесс находит изменённые места одним запросом по индексу
+    def __init__(self):
+        self.started = False
+        self.last_update = None
+        self._lock = threading.Lock()
+
+    def get_changed_places(self):
+        with self._lock:
+            if not self.started:
+                # Кэш ещё пуст, сбрасывать в нём нечего: только запоминаем, откуда смотреть изменения
+                self.last_update = Place.objects.get_last_coordinates_update()
+                self.started = True
+                return []
+            places = Place.objects.filter(coordinates_updated_at__isnull=False)
+            if self.last_update:
+                places = places.filter(coordinates_updated_at__gt=self.last_update)
+            changed_places = list(places.values_list('id', 'address_key', 'coordinates_updated_at'))
+            if changed_places:
+                self.last_update = max(updated_at for _, _, updated_at in changed_places)
+            return [(place_id, address_key) for place_id, address_key, _ in changed_places]
+
+
+class GeocodeCache:
+    def __init__(self, maxsize=10000, ttl=300, max_age_days=90):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_age = timedelta(days=max_age_days)
+        self.hits = 0
+        self.misses = 0
+        self.refresh_requests = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._changes = PlaceChangesTracker()
+
+    def _get_entry(self, address_key, now):
+        entry = self._entries.get(address_key)
+        if entry is None:
+            return None
+        place_id, coordinates, geocode_date, cached_at = entry
+        if now - cached_at > self.ttl:
+            del self._entries[address_key]
+            return None
+        self._entries.move_to_end(address_key)
+        return place_id, coordinates, geocode_date
+
+    def _set_entry(self, address_key, place, now):
+        self._entries[address_key] = (*place, now)
+        self._entries.move_to_end(address_key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_points(self, addresses):
+        # Возвращает {адрес: (id места, (широта, долгота))} для адресов с известными координатами
+        address_keys = {address: normalize_address(address) for address in set(addresses)}
+        self.invalidate(address_key for _, address_key in self._changes.get_changed_places())
+        now = time.monotonic()
+        places = {}
+        with self._lock:
+            for address_key in set(address_keys.values()):
+                entry = self._get_entry(address_key, now)
+                if entry:
+                    places[address_key] = entry
+            self.hits += len(places)
+
+        missing_keys = set(address_keys.values()) - places.keys()
+        if missing_keys:
+            found_places = Place.objects.get_located_places(missing_keys)
+            with self._lock:
+                self.misses += len(missing_keys)
+                for address_key, place in found_places.items():
+                    self._set_entry(address_key, place, now)
+            places.update(found_places)
+
+        self._refresh_stale(places)
+
+        return {
+            address: places[address_key][:2]
+            for address, address_key in address_keys.items()
+            if address_key in places
+        }
+
+    def _refresh_stale(self, places):
+        expiry_date = timezone.localdate() - self.max_age
+        stale_keys = [
+            address_key for address_key, (_, _, geocode_date) in places.items()
+            if geocode_date < expiry_date
+        ]
+        if not stale_keys:
+            return
+
+        # Координаты отдаём старые, а обновит их воркер geocode_places.
+        # Чтобы не ставить адрес в очередь на каждом запросе, сдвигаем дату в кэше
+        Place.objects.request_refresh(stale_keys)
+        today = timezone.localdate()
+        now = time.monotonic()
+        with self._lock:
+            self.refresh_requests += len(stale_keys)
+            for address_key in stale_keys:
+                place_id, coordinates, _ = places[address_key]
+                self._set_entry(address_key, (place_id, coordinates, today), now)
+
+    def invalidate(self, address_keys):
+        with self._lock:
+            for address_key in address_keys:
+                self._entries.pop(address_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'refresh_requests': self.refresh_requests,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+geocode_cache = GeocodeCache(**settings.GEOCODE_CACHE)
+
+
+class PlaceDistanceCache:
+    def __init__(self, maxsize=100000, ttl=3600, method='haversine'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.method = method
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._changes = PlaceChangesTracker()
+
+    def _set_entry(self, pair, distance, now):
+        self._entries[pair] = (distance, now)
+        self._entries.move_to_end(pair)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_distances(self, pairs, coordinates):
+        # pairs — пары (id места ресторана, id места клиента). Расстояния, которых нет
+        # ни в памяти, ни в таблице PlaceDistance, считаются по coordinates — координатам мест по их id
+        pairs = set(pairs)
+        # Строки PlaceDistance для изменённых мест уже удалил процесс, который их менял, а здесь чистим только память
+        self._forget_places({place_id for place_id, _ in self._changes.get_changed_places()})
+        now = time.monotonic()
+        distances = {}
+        with self._lock:
+            for pair in pairs:
+                entry = self._entries.get(pair)
+                if entry is None:
+                    continue
+                distance, cached_at = entry
+                if now - cached_at > self.ttl:
+                    del self._entries[pair]
+                    continue
+                self._entries.move_to_end(pair)
+                distances[pair] = distance
+            self.hits += len(distances)
+
+        missing_pairs = pairs - distances.keys()
+        if not missing_pairs:
+            return distances
+
+        stored_distances = PlaceDistance.objects.get_distances(missing_pairs)
+        computed_distances = self._compute(missing_pairs - stored_distances.keys(), coordinates)
+        PlaceDistance.objects.bulk_create(
+            [
+                PlaceDistance(restaurant_place_id=restaurant_place_id, customer_place_id=customer_place_id, distance=distance)
+                for (restaurant_place_id, customer_place_id), distance in computed_distances.items()
+            ],
+            ignore_conflicts=True,
+        )
+        with self._lock:
+            self.misses += len(missing_pairs)
+            self.computed += len(computed_distances)
+            for pair, distance in {**stored_distances, **computed_distances}.items():
+                self._set_entry(pair, distance, now)
+        distances.update(stored_distances)
+        distances.update(computed_distances)
+        return distances
+
+    def _compute(self, pairs, coordinates):
+        # Считаем матрицу для каждого места клиента сразу по всем его ресторанам
+        restaurant_places = defaultdict(list)
+        for restaurant_place_id, customer_place_id in pairs:
+            restaurant_places[customer_place_id].append(restaurant_place_id)
+
+        distances = {}
+        for customer_place_id, restaurant_place_ids in restaurant_places.items():
+            row = get_distance_matrix(
+                [coordinates[customer_place_id]],
+                [coordinates[restaurant_place_id] for restaurant_place_id in restaurant_place_ids],
+                method=self.method,
+            )[0]
+            for restaurant_place_id, distance in zip(restaurant_place_ids, row):
+                distances[restaurant_place_id, customer_place_id] = float(distance)
+        return distances
+
+    def _forget_places(self, place_ids):
+        if not place_ids:
+            return
+        with self._lock:
+            for pair in [pair for pair in self._entries if place_ids.intersection(pair)]:
+                del self._entries[pair]
+
+    def invalidate_places(self, place_ids):
+        place_ids = set(place_ids)
+        PlaceDistance.objects.for_places(place_ids).delete()
+        self._forget_places(place_ids)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'computed': self.computed,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+place_distance_cache = PlaceDistanceCache(method=settings.DISTANCE_METHOD, **settings.PLACE_DISTANCE_CACHE)
@@ -0,0 +1,57 @@
+"""Расчёт матрицы расстояний между наборами координат.
+
+Режим `haversine` считает расстояния на сфере радиусом EARTH_RADIUS_KM
+одной векторной операцией NumPy. Из-за сплющенности Земли ошибка
+относительно эллипсоида WGS-84 не превышает примерно 0.6% расстояния — для доставки
+по городу это десятки метров.
+
+Режим `geodesic` считает расстояния на эллипсоиде WGS-84 алгоритмом Карни
+(geopy.distance.geodesic) с ошибкой порядка 15 нм, но по одной паре за раз.
+"""
+import numpy as np
+
+from geopy import distance
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+DISTANCE_METHODS = ('haversine', 'geodesic')
+
+
+def _as_coordinates_array(coordinates):
+    return np.asarray(coordinates, dtype=float).reshape(-1, 2)
+
+
+def get_haversine_matrix(origins, destinations):
+    origins = np.radians(_as_coordinates_array(origins))
+    destinations = np.radians(_as_coordinates_array(destinations))
+
+    origin_lat = origins[:, 0, np.newaxis]
+    origin_lon = origins[:, 1, np.newaxis]
+    destination_lat = destinations[np.newaxis, :, 0]
+    destination_lon = destinations[np.newaxis, :, 1]
+
+    half_chord = (
+        np.sin((destination_lat - origin_lat) / 2) ** 2
+        + np.cos(origin_lat) * np.cos(destination_lat) * np.sin((destination_lon - origin_lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(half_chord, 0, 1)))
+
+
+def get_geodesic_matrix(origins, destinations):
+    origins = _as_coordinates_array(origins)
+    destinations = _as_coordinates_array(destinations)
+
+    matrix = np.empty((len(origins), len(destinations)))
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            matrix[row, column] = distance.geodesic(origin, destination).km
+    return matrix
+
+
+def get_distance_matrix(origins, destinations, method='haversine'):
+    if method == 'haversine':
+        return get_haversine_matrix(origins, destinations)
+    if method == 'geodesic':
+        return get_geodesic_matrix(origins, destinations)
+    raise ValueError(f'Unknown distance method: {method!r}, expected one of {DISTANCE_METHODS}')
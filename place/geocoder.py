@@ -0,0 +1,136 @@
+import threading
+import time
+from functools import lru_cache
+
+import requests
+
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .cache import geocode_cache, place_distance_cache
+from .models import Place, places_geocoded
+
+
+class GeocoderError(Exception):
+    pass
+
+
+class GeocoderUnavailable(GeocoderError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Полуоткрытое состояние: пропускаем один пробный запрос, остальные ждут его результата
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class YandexGeocoderClient:
+    def __init__(self, api_key, base_url, connect_timeout=3.05, read_timeout=5, retries=2,
+                 backoff_factor=0.5, pool_size=10, failure_threshold=5, reset_timeout=30):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.circuit_breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET'],
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def fetch_coordinates(self, address):
+        if not self.circuit_breaker.allow_request():
+            raise GeocoderUnavailable(f'Геокодер недоступен, повторите через {self.circuit_breaker.reset_timeout} сек.')
+
+        try:
+            response = self.session.get(self.base_url, params={
+                "geocode": address,
+                "apikey": self.api_key,
+                "format": "json",
+            }, timeout=self.timeout)
+            response.raise_for_status()
+            found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+        except (requests.RequestException, ValueError, KeyError) as error:
+            self.circuit_breaker.record_failure()
+            raise GeocoderError(f'{address}: {error}') from error
+        self.circuit_breaker.record_success()
+
+        if not found_places:
+            return None
+
+        most_relevant = found_places[0]
+        lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+        return lon, lat
+
+
+@lru_cache(maxsize=None)
+def get_geocoder(**overrides):
+    return YandexGeocoderClient(**{**settings.YANDEX_GEOCODER, **overrides})
+
+
+def notify_places_geocoded(address_keys):
+    # Сначала сбрасываем расстояния со старыми координатами, чтобы получатели сигнала их уже не увидели.
+    # Отметка coordinates_updated_at сообщает об изменении кэшам в остальных процессах
+    places = Place.objects.filter(address_key__in=address_keys)
+    places.update(coordinates_updated_at=timezone.now())
+    geocode_cache.invalidate(address_keys)
+    place_distance_cache.invalidate_places(places.values_list('id', flat=True))
+    places_geocoded.send(sender=Place, address_keys=set(address_keys))
+
+
+def geocode_place(place, geocoder=None, max_attempts=3):
+    geocoder = geocoder or get_geocoder()
+    try:
+        coordinates = geocoder.fetch_coordinates(place.address)
+    except GeocoderUnavailable:
+        raise
+    except GeocoderError:
+        place.attempts += 1
+        if place.attempts >= max_attempts:
+            place.status = Place.FAILED
+        place.save(update_fields=['attempts', 'status'])
+        raise
+
+    place.attempts += 1
+    if coordinates:
+        place.lon, place.lat = coordinates
+        place.status = Place.RESOLVED
+    else:
+        place.lat = place.lon = None
+        place.status = Place.NOT_FOUND
+    place.geocode_date = timezone.now()
+    # О новых координатах сообщит обработчик post_save в place/signals.py
+    place.save(update_fields=['lat', 'lon', 'status', 'attempts', 'geocode_date'])
+    return place
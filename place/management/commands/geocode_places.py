@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from place.geocoder import GeocoderError, GeocoderUnavailable, geocode_place, get_geocoder
+from place.models import Place
+
+
+class Command(BaseCommand):
+    help = 'Геокодирует адреса из очереди Place со статусом «Ожидает геокодирования»'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--sleep', type=float, default=5, help='Пауза между опросами пустой очереди, сек.')
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--geocoder-url', help='Адрес геокодера, например локальной заглушки')
+        parser.add_argument('--once', action='store_true', help='Разобрать очередь и завершиться')
+
+    def handle(self, *args, **options):
+        if options['geocoder_url']:
+            geocoder = get_geocoder(base_url=options['geocoder_url'])
+        else:
+            geocoder = get_geocoder()
+
+        while True:
+            places = list(Place.objects.pending().order_by('attempts', 'id')[:options['batch_size']])
+            if not places:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            for place in places:
+                try:
+                    geocode_place(place, geocoder=geocoder, max_attempts=options['max_attempts'])
+                except GeocoderUnavailable as error:
+                    self.stderr.write(str(error))
+                    time.sleep(geocoder.circuit_breaker.reset_timeout)
+                    break
+                except GeocoderError as error:
+                    self.stderr.write(str(error))
+                    continue
+                self.stdout.write(f'{place.address}: {place.get_status_display()}')
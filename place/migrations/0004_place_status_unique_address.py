@@ -0,0 +1,49 @@
+# Generated by Django 4.2.3 on 2023-08-14 11:20
+
+from django.db import migrations, models
+
+
+def fill_status_and_remove_duplicates(apps, schema_editor):
+    Place = apps.get_model('place', 'Place')
+    Place.objects.filter(lat__isnull=False, lon__isnull=False).update(status=1)
+    Place.objects.filter(lat__isnull=True).update(status=2)
+
+    kept_addresses = set()
+    duplicate_ids = []
+    places = Place.objects.order_by('address', 'status', '-geocode_date', '-id').values_list('id', 'address')
+    for place_id, address in places:
+        if address in kept_addresses:
+            duplicate_ids.append(place_id)
+        else:
+            kept_addresses.add(address)
+    Place.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0003_alter_place_lat_alter_place_lon'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='place',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток геокодирования'),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='status',
+            field=models.IntegerField(choices=[(0, 'Ожидает геокодирования'), (1, 'Координаты найдены'), (2, 'Адрес не найден'), (3, 'Ошибка геокодера')], db_index=True, default=0, verbose_name='Статус геокодирования'),
+        ),
+        migrations.RunPython(fill_status_and_remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='place',
+            name='address',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Адрес'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2023-08-21 10:05
+
+from django.db import migrations, models
+
+from place.addresses import normalize_address
+
+
+def fill_address_key(apps, schema_editor):
+    Place = apps.get_model('place', 'Place')
+    kept_keys = set()
+    places = Place.objects.order_by(models.F('lat').desc(nulls_last=True), '-geocode_date', '-id')
+    for place in places:
+        address_key = normalize_address(place.address)
+        if address_key in kept_keys:
+            place.delete()
+            continue
+        kept_keys.add(address_key)
+        place.address_key = address_key
+        place.save(update_fields=['address_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0004_place_status_unique_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='address_key',
+            field=models.CharField(max_length=100, null=True, verbose_name='Нормализованный адрес'),
+        ),
+        migrations.RunPython(fill_address_key, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='place',
+            name='address_key',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Нормализованный адрес'),
+        ),
+    ]
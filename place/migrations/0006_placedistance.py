@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2023-10-19 13:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0005_place_address_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaceDistance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance', models.FloatField(verbose_name='Расстояние, км')),
+                ('customer_place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='restaurant_distances', to='place.place', verbose_name='Адрес клиента')),
+                ('restaurant_place', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_distances', to='place.place', verbose_name='Адрес ресторана')),
+            ],
+            options={
+                'verbose_name': 'Расстояние',
+                'verbose_name_plural': 'Расстояния',
+                'unique_together': {('restaurant_place', 'customer_place')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2023-10-27 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('place', '0006_placedistance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='coordinates_updated_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Координаты изменены'),
+        ),
+    ]
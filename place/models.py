@@ -1,15 +1,140 @@
 from django.db import models
+from django.dispatch import Signal
 from django.utils import timezone
 
+from .addresses import normalize_address
+
+
+# Отправляется после того, как у адресов обновились координаты. Аргумент address_keys — их ключи
+places_geocoded = Signal()
+
+
+class PlaceQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(status=Place.PENDING)
+
+    def enqueue(self, addresses):
+        places = [
+            Place(address=address, address_key=normalize_address(address), status=Place.PENDING)
+            for address in set(addresses) if address
+        ]
+        return self.bulk_create(places, ignore_conflicts=True)
+
+    def request_refresh(self, address_keys):
+        return self.filter(address_key__in=address_keys, status=Place.RESOLVED).update(status=Place.PENDING)
+
+    def get_last_coordinates_update(self):
+        return self.aggregate(last_update=models.Max('coordinates_updated_at'))['last_update']
+
+    def get_located_places(self, address_keys):
+        places = (
+            self.filter(address_key__in=address_keys, lat__isnull=False, lon__isnull=False)
+            .values_list('address_key', 'id', 'lat', 'lon', 'geocode_date')
+        )
+        return {
+            address_key: (place_id, (float(lat), float(lon)), geocode_date)
+            for address_key, place_id, lat, lon, geocode_date in places
+        }
+
 
 class Place(models.Model):
-    address = models.CharField('Адрес', max_length=100)
+    PENDING = 0
+    RESOLVED = 1
+    NOT_FOUND = 2
+    FAILED = 3
+
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает геокодирования'),
+        (RESOLVED, 'Координаты найдены'),
+        (NOT_FOUND, 'Адрес не найден'),
+        (FAILED, 'Ошибка геокодера'),
+    ]
+
+    address = models.CharField('Адрес', max_length=100, unique=True)
+    address_key = models.CharField('Нормализованный адрес', max_length=100, unique=True)
     lat = models.DecimalField('Широта', max_digits=9, decimal_places=6, blank=True, null=True)
     lon = models.DecimalField('Долгота', max_digits=9, decimal_places=6, blank=True, null=True)
     geocode_date = models.DateField('Дата запроса', default=timezone.now,)
+    status = models.IntegerField(
+        'Статус геокодирования',
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток геокодирования', default=0)
+    coordinates_updated_at = models.DateTimeField(
+        'Координаты изменены',
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+    )
 
-    class Meta:
-        unique_together = ['lat', 'lon', 'address']
+    objects = PlaceQuerySet.as_manager()
 
     def __str__(self):
         return self.address
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        place = super().from_db(db, field_names, values)
+        # Запоминаем координаты из базы, чтобы после сохранения понять, поменялись ли они
+        if 'lat' in field_names and 'lon' in field_names:
+            place.saved_coordinates = place.get_coordinates()
+        return place
+
+    def get_coordinates(self):
+        if self.lat is None or self.lon is None:
+            return None
+        return round(float(self.lat), 6), round(float(self.lon), 6)
+
+    def save(self, *args, **kwargs):
+        self.address_key = normalize_address(self.address)
+        super().save(*args, **kwargs)
+
+
+class PlaceDistanceQuerySet(models.QuerySet):
+    def for_places(self, place_ids):
+        return self.filter(models.Q(restaurant_place__in=place_ids) | models.Q(customer_place__in=place_ids))
+
+    def get_distances(self, pairs):
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        distances = self.filter(
+            restaurant_place__in={restaurant_place_id for restaurant_place_id, _ in pairs},
+            customer_place__in={customer_place_id for _, customer_place_id in pairs},
+        ).values_list('restaurant_place_id', 'customer_place_id', 'distance')
+        return {
+            (restaurant_place_id, customer_place_id): distance
+            for restaurant_place_id, customer_place_id, distance in distances
+            if (restaurant_place_id, customer_place_id) in pairs
+        }
+
+
+class PlaceDistance(models.Model):
+    restaurant_place = models.ForeignKey(
+        Place,
+        verbose_name='Адрес ресторана',
+        related_name='customer_distances',
+        on_delete=models.CASCADE,
+    )
+    customer_place = models.ForeignKey(
+        Place,
+        verbose_name='Адрес клиента',
+        related_name='restaurant_distances',
+        on_delete=models.CASCADE,
+    )
+    distance = models.FloatField('Расстояние, км')
+
+    objects = PlaceDistanceQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Расстояние'
+        verbose_name_plural = 'Расстояния'
+        unique_together = [
+            ['restaurant_place', 'customer_place'],
+        ]
+
+    def __str__(self):
+        return f'{self.restaurant_place} — {self.customer_place}: {self.distance:.2f} км'
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .geocoder import notify_places_geocoded
+from .models import Place
+
+
+@receiver(post_save, sender=Place)
+def notify_coordinates_changed(sender, instance, created, update_fields, **kwargs):
+    # Координаты меняют и воркер геокодера, и менеджер в админке
+    if update_fields is not None and not update_fields & {'lat', 'lon'}:
+        return
+    coordinates = instance.get_coordinates()
+    if created:
+        changed = coordinates is not None
+    else:
+        changed = getattr(instance, 'saved_coordinates', ()) != coordinates
+    instance.saved_coordinates = coordinates
+    if changed:
+        notify_places_geocoded({instance.address_key})
@@ -0,0 +1,115 @@
+"""Поиск ближайших точек по регулярной сетке.
+
+Точки раскладываются по ячейкам размером примерно cell_size_km на cell_size_km.
+Поиск обходит кольца ячеек вокруг ячейки запроса, начиная с ближайшего,
+и останавливается, как только следующее кольцо гарантированно дальше
+найденных k точек или радиуса поиска. Поэтому время поиска зависит от
+числа точек рядом с запросом, а не от числа точек в индексе.
+"""
+import math
+from collections import defaultdict
+
+from .distance import get_distance_matrix
+
+
+# Градус широты короче всего на экваторе, так ячейка по широте не будет меньше cell_size_km
+KM_PER_DEGREE_LAT = 110.5
+BRUTE_FORCE_LIMIT = 32
+
+
+class GridIndex:
+    def __init__(self, points, cell_size_km=1.0, method='haversine'):
+        points = list(points)
+        self.cell_size_km = cell_size_km
+        self.method = method
+        self.lat_step = cell_size_km / KM_PER_DEGREE_LAT
+        # Шаг по долготе считаем на самой далёкой от экватора точке:
+        # тогда ни одна ячейка не окажется уже cell_size_km и оценка расстояния до кольца остаётся нижней
+        max_lat = max((abs(lat) for _, (lat, lon) in points), default=0)
+        self.lon_step = self.lat_step / max(math.cos(math.radians(max_lat)), 0.01)
+
+        self._points = dict(points)
+        self._cells = defaultdict(list)
+        for point_id, coordinates in self._points.items():
+            self._cells[self.get_cell(coordinates)].append((point_id, coordinates))
+        rows = [row for row, _ in self._cells]
+        columns = [column for _, column in self._cells]
+        self._bounds = (min(rows), max(rows), min(columns), max(columns)) if self._cells else None
+
+    def __len__(self):
+        return len(self._points)
+
+    def get_cell(self, coordinates):
+        lat, lon = coordinates
+        return math.floor(lat / self.lat_step), math.floor(lon / self.lon_step)
+
+    def _get_max_ring(self, cell):
+        if not self._bounds:
+            return -1
+        row, column = cell
+        min_row, max_row, min_column, max_column = self._bounds
+        return max(abs(row - min_row), abs(row - max_row), abs(column - min_column), abs(column - max_column))
+
+    def _filter_nearest(self, coordinates, points, k, max_distance_km):
+        if not points:
+            return []
+        distances = get_distance_matrix(
+            [coordinates],
+            [point_coordinates for _, point_coordinates in points],
+            method=self.method,
+        )[0]
+        found = [
+            (point_id, float(distance))
+            for (point_id, _), distance in zip(points, distances)
+            if max_distance_km is None or distance <= max_distance_km
+        ]
+        found.sort(key=lambda item: item[1])
+        return found[:k]
+
+    def _iter_ring(self, cell, ring):
+        row, column = cell
+        if ring == 0:
+            yield cell
+            return
+        for offset in range(-ring, ring + 1):
+            yield row - ring, column + offset
+            yield row + ring, column + offset
+        for offset in range(-ring + 1, ring):
+            yield row + offset, column - ring
+            yield row + offset, column + ring
+
+    def nearest(self, coordinates, k, max_distance_km=None, allowed_ids=None):
+        if allowed_ids is not None and len(allowed_ids) <= BRUTE_FORCE_LIMIT:
+            # Когда подходящих точек единицы, дешевле посчитать расстояние до каждой, чем обходить сетку
+            points = [
+                (point_id, self._points[point_id])
+                for point_id in allowed_ids
+                if point_id in self._points
+            ]
+            return self._filter_nearest(coordinates, points, k, max_distance_km)
+
+        cell = self.get_cell(coordinates)
+        max_ring = self._get_max_ring(cell)
+        found = []
+        ring = 0
+        while ring <= max_ring:
+            points = [
+                (point_id, point_coordinates)
+                for ring_cell in self._iter_ring(cell, ring)
+                for point_id, point_coordinates in self._cells.get(ring_cell, ())
+                if allowed_ids is None or point_id in allowed_ids
+            ]
+            if points:
+                found = sorted(
+                    found + self._filter_nearest(coordinates, points, k, max_distance_km),
+                    key=lambda item: item[1],
+                )[:k]
+
+            # Любая точка из следующего кольца не ближе ring полных ячеек от запроса
+            ring_distance = ring * self.cell_size_km
+            if max_distance_km is not None and ring_distance > max_distance_km:
+                break
+            if len(found) == k and found[-1][1] <= ring_distance:
+                break
+            ring += 1
+        return found
@@ -1,24 +1,19 @@
-import requests
+import json
 
 from django import forms
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
 from django.views import View
 
-from collections import Counter
-from geopy import distance
-from environs import Env
-
-from foodcartapp.models import Product, Restaurant, Order, RestaurantMenuItem
-from foodcartapp.views import create_place
-from place.models import Place
-
-
-env = Env()
-env.read_env()
+from foodcartapp.availability import build_availability_matrix, set_menu_availability
+from foodcartapp.models import Order, OrderCandidate, Product, Restaurant
+from place.cache import geocode_cache
 
 
 class Login(forms.Form):
@@ -73,19 +68,52 @@ def is_manager(user):
     return user.is_staff  # FIXME replace with specific permission
 
 
+def parse_cells(values):
+    cells = set()
+    for value in values:
+        product_id, _, restaurant_id = value.partition('-')
+        if product_id.isdigit() and restaurant_id.isdigit():
+            cells.add((int(product_id), int(restaurant_id)))
+    return cells
+
+
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_products(request):
     restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
-
-    products_with_restaurant_availability = []
-    for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
-
-        products_with_restaurant_availability.append(
-            (product, ordered_availability)
-        )
+    products = list(Product.objects.select_related('category'))
+    product_ids = [product.id for product in products]
+    restaurant_ids = [restaurant.id for restaurant in restaurants]
+
+    if request.method == 'POST':
+        # Страница присылает одним полем только ячейки, которые переключил менеджер: так форма не упирается
+        # в DATA_UPLOAD_MAX_NUMBER_FIELDS, а изменения, сделанные другими за это время, не откатываются
+        try:
+            changes = json.loads(request.POST.get('changes') or '{}')
+            enabled_cells = parse_cells(changes.get('enabled', []))
+            disabled_cells = parse_cells(changes.get('disabled', []))
+        except (ValueError, TypeError, AttributeError):
+            return HttpResponseBadRequest('Некорректный список изменений')
+
+        known_product_ids = set(product_ids)
+        known_restaurant_ids = set(restaurant_ids)
+
+        def get_menu_cells(cells):
+            return {
+                (restaurant_id, product_id)
+                for product_id, restaurant_id in cells
+                if product_id in known_product_ids and restaurant_id in known_restaurant_ids
+            }
+
+        with transaction.atomic():
+            set_menu_availability(get_menu_cells(enabled_cells), True)
+            set_menu_availability(get_menu_cells(disabled_cells), False)
+        return redirect('restaurateur:ProductsView')
+
+    availability = build_availability_matrix(product_ids, restaurant_ids)
+    products_with_restaurant_availability = [
+        (product, list(zip(restaurant_ids, row)))
+        for product, row in zip(products, availability.tolist())
+    ]
     return render(request, template_name="products_list.html", context={
         'products_with_restaurant_availability': products_with_restaurant_availability,
         'restaurants': restaurants,
@@ -102,26 +130,25 @@ def view_restaurants(request):
 @user_passes_test(is_manager, login_url='restaurateur:login')
 def view_orders(request):
     orders_with_total_cost = []
-    orders = Order.objects.get_orders()
-    restaurant_menu_items = RestaurantMenuItem.objects.get_available_items()
+    candidates = (
+        OrderCandidate.objects
+        .select_related('restaurant')
+        .with_score()
+        .order_by(F('score').asc(nulls_last=True), 'id')
+    )
+    orders = Order.objects.get_orders().select_related('restaurant').prefetch_related(
+        Prefetch('candidates', queryset=candidates)
+    )
+
     for order in orders:
-        order_products = set(order.products.all().values_list('id', flat=True))
-        available_restaurants = [item.restaurant for item in restaurant_menu_items.filter(product_id__in=order_products)]
-        restaurant_counter = Counter(available_restaurants)
-        selected_restaurants = [restaurant for restaurant, count in restaurant_counter.items() if count == len(order_products)]
-        delivery_distance = []
-        for restaurant in selected_restaurants:
-            try:
-                order_place = Place.objects.get(address=order.address)
-                restaurant_place = Place.objects.get(address=restaurant.address)
-                client_coordinates = [order_place.lat, order_place.lon]
-                restaurant_coordinates = [restaurant_place.lat, restaurant_place.lon]
-                distance_km = f'{round(distance.distance(client_coordinates, restaurant_coordinates).km, 2)} км'
-                if not order_place.lat:
-                    distance_km = 'Дистанция не определена'
-                delivery_distance.append((restaurant.name, distance_km))
-            except Place.DoesNotExist:
-                create_place(order.address)
+        delivery_distance = [
+            (
+                candidate.restaurant.name,
+                f'{round(candidate.distance, 2)} км, в очереди {candidate.restaurant.queue_depth}'
+                if candidate.distance is not None else 'Дистанция не определена',
+            )
+            for candidate in order.candidates.all()
+        ]
         order_payload = {
             'id': order.id,
             'status': order.get_status_display,
@@ -140,3 +167,7 @@ def view_orders(request):
         'order_items': orders_with_total_cost,
     })
 
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def view_geocode_cache_stats(request):
+    return JsonResponse(geocode_cache.get_stats())
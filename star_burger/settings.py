@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 import dj_database_url
 
@@ -84,6 +85,21 @@ WSGI_APPLICATION = 'star_burger.wsgi.application'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+THUMBNAILS_DIR = 'thumbnails'
+PRODUCT_THUMBNAIL_WIDTHS = env.list('PRODUCT_THUMBNAIL_WIDTHS', subcast=int, default=[100, 300, 600])
+
+# По умолчанию поиск товаров выбирается по типу базы: FTS5 для SQLite, tsvector и триграммы для PostgreSQL
+PRODUCT_SEARCH_BACKEND = env.str('PRODUCT_SEARCH_BACKEND', default='')
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', default='locmem://'),
+}
+
+CATALOG_CACHE_TIMEOUT = env.int('CATALOG_CACHE_TIMEOUT', default=24 * 60 * 60)
+BANNERS_CACHE_TIMEOUT = env.int('BANNERS_CACHE_TIMEOUT', default=24 * 60 * 60)
+BANNERS_MAX_AGE = env.int('BANNERS_MAX_AGE', default=60)
+CATALOG_SNAPSHOT_DIR = env.str('CATALOG_SNAPSHOT_DIR', default=os.path.join(BASE_DIR, 'catalog_snapshot'))
+
 DATABASES = {
     'default': dj_database_url.config(default=env.str('DB_URL'))
 }
@@ -124,6 +140,40 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "bundles"),
 ]
 
+YANDEX_GEOCODER = {
+    'api_key': env.str('YANDEX_GEOCODER_API_KEY', default=None),
+    'base_url': env.str('YANDEX_GEOCODER_URL', default='https://geocode-maps.yandex.ru/1.x'),
+    'connect_timeout': env.float('YANDEX_GEOCODER_CONNECT_TIMEOUT', default=3.05),
+    'read_timeout': env.float('YANDEX_GEOCODER_READ_TIMEOUT', default=5),
+    'retries': env.int('YANDEX_GEOCODER_RETRIES', default=2),
+    'backoff_factor': env.float('YANDEX_GEOCODER_BACKOFF_FACTOR', default=0.5),
+    'pool_size': env.int('YANDEX_GEOCODER_POOL_SIZE', default=10),
+    'failure_threshold': env.int('YANDEX_GEOCODER_FAILURE_THRESHOLD', default=5),
+    'reset_timeout': env.float('YANDEX_GEOCODER_RESET_TIMEOUT', default=30),
+}
+
+GEOCODE_CACHE = {
+    'maxsize': env.int('GEOCODE_CACHE_SIZE', default=10000),
+    'ttl': env.int('GEOCODE_CACHE_TTL', default=300),
+    'max_age_days': env.int('GEOCODE_MAX_AGE_DAYS', default=90),
+}
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=env.int('IDEMPOTENCY_KEY_TTL_HOURS', default=24))
+
+ORDER_BATCH_MAX_SIZE = env.int('ORDER_BATCH_MAX_SIZE', default=1000)
+ORDER_BATCH_CHUNK_SIZE = env.int('ORDER_BATCH_CHUNK_SIZE', default=100)
+
+DISTANCE_METHOD = env.str('DISTANCE_METHOD', default='haversine')
+PLACE_DISTANCE_CACHE = {
+    'maxsize': env.int('PLACE_DISTANCE_CACHE_SIZE', default=100000),
+    'ttl': env.int('PLACE_DISTANCE_CACHE_TTL', default=60 * 60),
+}
+RESTAURANT_INDEX_CELL_KM = env.float('RESTAURANT_INDEX_CELL_KM', default=1.0)
+ORDER_CANDIDATES_LIMIT = env.int('ORDER_CANDIDATES_LIMIT', default=5)
+ORDER_CANDIDATES_MAX_DISTANCE_KM = env.float('ORDER_CANDIDATES_MAX_DISTANCE_KM', default=20)
+ROUTING_DISTANCE_WEIGHT = env.float('ROUTING_DISTANCE_WEIGHT', default=1.0)
+ROUTING_LOAD_WEIGHT = env.float('ROUTING_LOAD_WEIGHT', default=0.5)
+
 ROLLBAR = {
     'access_token': env.str('ROLLBAR_ACCESS_TOKEN', default=None),
     'environment': env.str('ROLLBAR_ENVIRONMENT', default='development'),
@@ -14,6 +14,8 @@ git pull
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate --noinput
+python manage.py generate_thumbnails
+python manage.py build_catalog_snapshot
 
 npm ci --dev
 ./node_modules/.bin/parcel build bundles-src/index.js --dist-dir bundles --public-url="./"